@@ -7,6 +7,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'movies.apps.MoviesConfig',
     "debug_toolbar",
 ]
\ No newline at end of file
@@ -71,6 +71,21 @@ include(
 
 LOCALE_PATHS = ['movies/locale']
 
+# Выше этого числа строк списки в админке показывают оценку количества
+# вместо точного COUNT(*), подсчёт с фильтрами кешируется на TTL секунд
+ADMIN_EXACT_COUNT_THRESHOLD = int(
+    os.environ.get('ADMIN_EXACT_COUNT_THRESHOLD', 10000)
+)
+ADMIN_COUNT_CACHE_TTL = int(os.environ.get('ADMIN_COUNT_CACHE_TTL', 300))
+# Сколько самых похожих строк показывает нечёткий поиск по именам
+ADMIN_TRIGRAM_LIMIT = int(os.environ.get('ADMIN_TRIGRAM_LIMIT', 100))
+# Сколько связей с жанрами и персонами на странице фильма
+ADMIN_INLINE_PER_PAGE = int(os.environ.get('ADMIN_INLINE_PER_PAGE', 50))
+# Списки фильмов и персон листаются по ключу сортировки вместо OFFSET
+ADMIN_KEYSET_PAGINATION = os.environ.get(
+    'ADMIN_KEYSET_PAGINATION', False
+) == 'True'
+
 INTERNAL_IPS = [
     os.environ.get('HOST'),
 ]
@@ -1,45 +1,123 @@
 from django.contrib import admin
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import OuterRef, Subquery, TextField
+from django.utils.translation import gettext_lazy as _
 from .models import Genre, Filmwork, GenreFilmwork, Person, \
     PersonFilmwork
+from .paginator import EstimatedCountPaginator, KeysetChangeList, \
+    PaginatedInlineFormSet
+from .search import FullTextSearchMixin, SearchModeFilter, \
+    SimilarityChangeList, TrigramSearchMixin
 
 
-class GenreFilmworkInline(admin.TabularInline):
+class PaginatedTabularInline(admin.TabularInline):
+    """Табличный инлайн по страницам ADMIN_INLINE_PER_PAGE записей"""
+    formset = PaginatedInlineFormSet
+    template = 'admin/edit_inline/paginated_tabular.html'
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = settings.ADMIN_INLINE_PER_PAGE
+        formset.page_param = f'{formset.get_default_prefix()}-page'
+        formset.query = request.GET
+        return formset
+
+
+class GenreFilmworkInline(PaginatedTabularInline):
     model = GenreFilmwork
+    autocomplete_fields = ('genre',)
 
 
-class PersonFilmworkInline(admin.TabularInline):
+class PersonFilmworkInline(PaginatedTabularInline):
     model = PersonFilmwork
+    autocomplete_fields = ('person',)
+
+
+def film_work_names(through, field: str) -> Subquery:
+    """Имена связанных записей фильма одним массивом. Коррелированный
+    подзапрос идёт по индексу связующей таблицы и считается только
+    для строк страницы"""
+    return Subquery(
+        through.objects
+        .filter(film_work=OuterRef('pk'))
+        .values('film_work')
+        .annotate(names=ArrayAgg(field, distinct=True, ordering=field))
+        .values('names'),
+        output_field=ArrayField(TextField()),
+    )
+
+
+class FilmworkChangeList(KeysetChangeList):
+    """Список фильмов загружает только колонки list_display,
+    а жанры и персоны получает в том же запросе"""
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .only(*self.model_admin.list_columns)
+            .annotate(genre_names=film_work_names(GenreFilmwork,
+                                                  'genre__name'),
+                      person_names=film_work_names(PersonFilmwork,
+                                                   'person__full_name'))
+        )
+
+
+class PersonChangeList(KeysetChangeList, SimilarityChangeList):
+    """Список персон по ключу, а при нечётком поиске — по сходству"""
 
 
 @admin.register(Genre)
-class GenreAdmin(admin.ModelAdmin):
+class GenreAdmin(TrigramSearchMixin, admin.ModelAdmin):
     list_display = ('name',)
+    list_filter = (SearchModeFilter,)
+    trigram_field = 'name'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     search_fields = ('name', 'description', 'id')
 
 
 
 @admin.register(Person)
-class PersonAdmin(admin.ModelAdmin):
+class PersonAdmin(TrigramSearchMixin, admin.ModelAdmin):
     list_display = ('full_name',)
+    list_filter = (SearchModeFilter,)
+    trigram_field = 'full_name'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    keyset_pagination = settings.ADMIN_KEYSET_PAGINATION
+    change_list_template = 'admin/keyset_change_list.html'
 
     search_fields = ('full_name', 'id')
 
+    def get_changelist(self, request, **kwargs):
+        return PersonChangeList
+
 
 @admin.register(Filmwork)
-class FilmworkAdmin(admin.ModelAdmin):
+class FilmworkAdmin(FullTextSearchMixin, admin.ModelAdmin):
     inlines = (GenreFilmworkInline, PersonFilmworkInline)
-    list_prefetch_related = ['genres', 'persons']
-    list_display = ('title', 'type', 'creation_date', 'rating', )
+    list_columns = ('title', 'type', 'creation_date', 'rating', )
+    list_display = list_columns + ('get_genres', 'get_persons', )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    keyset_pagination = settings.ADMIN_KEYSET_PAGINATION
+    change_list_template = 'admin/keyset_change_list.html'
 
     list_filter = ('type', 'creation_date',)
 
     search_fields = ('title', 'description', 'id')
 
-    def get_queryset(self, request):
-        queryset = (
-                    super()
-                    .get_queryset(request)
-                    .prefetch_related(*self.list_prefetch_related)
-        )
-        return queryset
+    def get_changelist(self, request, **kwargs):
+        return FilmworkChangeList
+
+    @admin.display(description=_('Genres'))
+    def get_genres(self, obj):
+        return ', '.join(obj.genre_names or ())
+
+    @admin.display(description=_('Persons'))
+    def get_persons(self, obj):
+        return ', '.join(obj.person_names or ())
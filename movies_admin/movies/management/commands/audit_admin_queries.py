@@ -0,0 +1,130 @@
+import json
+import uuid
+from urllib.parse import parse_qsl
+
+from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, SEARCH_VAR
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для запросов списков админки (сортировки, '
+            'фильтры, поиск) и обратных связей и отмечает '
+            'последовательное чтение больших таблиц. Списки строятся '
+            'как в админке, поэтому их страницы загружаются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=int, default=10000,
+                            help='отмечать Seq Scan таблиц больше '
+                                 'этого числа строк')
+        parser.add_argument('--search-term', default='star',
+                            help='строка для проверки поиска')
+        parser.add_argument('--analyze', action='store_true',
+                            help='EXPLAIN ANALYZE с фактическим временем')
+
+    def handle(self, *args, **options):
+        self.threshold = options['threshold']
+        self.analyze = options['analyze']
+        self.factory = RequestFactory()
+        self.user = User(is_active=True, is_staff=True, is_superuser=True)
+        flagged = 0
+        for model, model_admin in admin.site._registry.items():
+            if model._meta.app_label != 'movies':
+                continue
+            for name, queryset in self.admin_queries(model_admin,
+                                                     options['search_term']):
+                flagged += self.audit(f'{model.__name__}: {name}', queryset)
+            for name, queryset in self.reverse_queries(model):
+                flagged += self.audit(f'{model.__name__}: {name}', queryset)
+        if flagged:
+            raise CommandError(f'{flagged} sequential scans over '
+                               f'{self.threshold} rows')
+
+    def changelist(self, model_admin, params: dict):
+        request = self.factory.get('/', params)
+        request.user = self.user
+        return model_admin.get_changelist_instance(request)
+
+    def admin_queries(self, model_admin, search_term: str):
+        """Страница списка по умолчанию, с каждой сортировкой,
+        с каждым значением фильтров и с поиском"""
+        changelist = self.changelist(model_admin, {})
+        yield 'changelist', changelist.queryset[:changelist.list_per_page]
+        for index, field_name in enumerate(changelist.list_display):
+            if changelist.get_ordering_field(field_name) is None:
+                continue
+            for order in (str(index), f'-{index}'):
+                ordered = self.changelist(model_admin, {ORDER_VAR: order})
+                yield (f'order by {field_name} {order}',
+                       ordered.queryset[:ordered.list_per_page])
+        for spec in changelist.filter_specs:
+            for choice in list(spec.choices(changelist))[1:]:
+                params = dict(parse_qsl(choice['query_string'].lstrip('?'),
+                                        keep_blank_values=True))
+                filtered = self.changelist(model_admin, params)
+                yield (f'filter {choice["display"]}',
+                       filtered.queryset[:filtered.list_per_page])
+        if model_admin.search_fields:
+            searched = self.changelist(model_admin,
+                                       {SEARCH_VAR: search_term})
+            yield (f'search {search_term!r}',
+                   searched.queryset[:searched.list_per_page])
+
+    @staticmethod
+    def reverse_queries(model):
+        """Выборки связанных записей по внешнему ключу на model, как при
+        показе инлайнов и подтверждении удаления"""
+        for relation in model._meta.related_objects:
+            if relation.many_to_many:
+                continue
+            yield (f'{relation.related_model.__name__} '
+                   f'by {relation.field.attname}',
+                   relation.related_model.objects.filter(
+                       **{relation.field.attname: uuid.uuid4()}
+                   ))
+
+    def audit(self, name: str, queryset) -> int:
+        sql, params = queryset.query.sql_with_params()
+        explain = 'ANALYZE, ' if self.analyze else ''
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN ({explain}VERBOSE, FORMAT JSON) {sql}',
+                           params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            flagged = []
+            for node in plan_nodes(plan[0]['Plan']):
+                if node['Node Type'] != 'Seq Scan':
+                    continue
+                rows = self.table_rows(cursor, node['Schema'],
+                                       node['Relation Name'])
+                if rows > self.threshold:
+                    flagged.append((node, rows))
+        if not flagged:
+            self.stdout.write(f'ok    {name}')
+            return 0
+        for node, rows in flagged:
+            self.stdout.write(self.style.WARNING(
+                f'SCAN  {name}: {node["Schema"]}.{node["Relation Name"]} '
+                f'~{rows} rows, filter {node.get("Filter", "-")}'
+            ))
+        return len(flagged)
+
+    @staticmethod
+    def table_rows(cursor, schema: str, table: str) -> int:
+        cursor.execute("""
+            SELECT c.reltuples::bigint
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = %s AND c.relname = %s;
+        """, (schema, table))
+        return max(cursor.fetchone()[0], 0)
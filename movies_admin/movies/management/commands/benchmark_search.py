@@ -0,0 +1,67 @@
+import statistics
+import time
+
+from django.contrib import admin
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from movies.models import Genre, Person
+from movies.search import TRIGRAM_MODE, SearchModeFilter
+
+MODELS = {
+    'person': Person,
+    'genre': Genre,
+}
+
+
+def legacy_search(model_admin, request, queryset, search_term):
+    """Поиск Django по search_fields: UPPER(...) LIKE '%...%'"""
+    return admin.ModelAdmin.get_search_results(model_admin, request,
+                                               queryset, search_term)
+
+
+def mode_search(model_admin, request, queryset, search_term):
+    return model_admin.get_search_results(request, queryset, search_term)
+
+
+# Режим -> (поиск, параметры запроса к списку)
+MODES = {
+    'search_fields': (legacy_search, {}),
+    'fulltext': (mode_search, {}),
+    'trigram': (mode_search,
+                {SearchModeFilter.parameter_name: TRIGRAM_MODE}),
+}
+
+
+class Command(BaseCommand):
+    help = ('Задержка поиска в админке персон и жанров: search_fields, '
+            'полнотекстовый и нечёткий поиск по триграммам')
+
+    def add_arguments(self, parser):
+        parser.add_argument('terms', nargs='+', help='поисковые строки')
+        parser.add_argument('--model', choices=list(MODELS),
+                            default='person')
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--per-page', type=int, default=100,
+                            help='строк на странице списка')
+
+    def handle(self, *args, **options):
+        model_admin = admin.site._registry[MODELS[options['model']]]
+        factory = RequestFactory()
+        for term in options['terms']:
+            for mode, (search, params) in MODES.items():
+                request = factory.get('/', {'q': term, **params})
+                queryset, _ = search(model_admin, request,
+                                     model_admin.get_queryset(request),
+                                     term)
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    rows = list(queryset[:options['per_page']])
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f'{term!r:24} {mode:14} rows {len(rows):5} '
+                    f'median {statistics.median(timings):9.2f} ms '
+                    f'max {timings[-1]:9.2f} ms'
+                )
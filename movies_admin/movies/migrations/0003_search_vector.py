@@ -0,0 +1,91 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Колонки, из которых собирается search_vector, и их вес в ранжировании.
+# Каждая колонка разбирается русской и английской конфигурациями,
+# как в LOCALE_PATHS
+SEARCH_COLUMNS = {
+    'film_work': (('title', 'A'), ('description', 'B')),
+    'genre': (('name', 'A'), ('description', 'B')),
+    'person': (('full_name', 'A'),),
+}
+SEARCH_CONFIGS = ('russian', 'english')
+
+
+def search_vector_sql(table: str, row: str) -> str:
+    return ' || '.join(
+        f"setweight(to_tsvector('{config}', coalesce({row}.{column}, '')),"
+        f" '{weight}')"
+        for column, weight in SEARCH_COLUMNS[table]
+        for config in SEARCH_CONFIGS
+    )
+
+
+def create_triggers_sql(table: str) -> str:
+    # Функции лежат в public, чтобы пережить подмену схемы content
+    # при перезагрузке данных через sqlite_to_postgres --staging-swap
+    columns = ', '.join(column for column, _ in SEARCH_COLUMNS[table])
+    return f"""
+        CREATE FUNCTION public.{table}_search_vector() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {search_vector_sql(table, 'NEW')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER {table}_search_vector
+            BEFORE INSERT OR UPDATE OF {columns} ON content.{table}
+            FOR EACH ROW EXECUTE PROCEDURE public.{table}_search_vector();
+
+        UPDATE content.{table}
+            SET search_vector = {search_vector_sql(table, table)};
+    """
+
+
+def drop_triggers_sql(table: str) -> str:
+    return f"""
+        DROP TRIGGER IF EXISTS {table}_search_vector ON content.{table};
+        DROP FUNCTION IF EXISTS public.{table}_search_vector();
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0002_auto_20221026_1815'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filmwork',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='genre',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql=[create_triggers_sql(table) for table in SEARCH_COLUMNS],
+            reverse_sql=[drop_triggers_sql(table) for table in SEARCH_COLUMNS],
+        ),
+        migrations.AddIndex(
+            model_name='filmwork',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='film_work_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='genre',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='genre_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='person_search_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='genre',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='genre_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['full_name'], name='person_full_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
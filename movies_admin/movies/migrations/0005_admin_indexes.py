@@ -0,0 +1,61 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY не блокирует запись в большие таблицы,
+    # но не может выполняться в транзакции
+    atomic = False
+
+    dependencies = [
+        ('movies', '0004_trigram_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='filmwork',
+            index=models.Index(fields=['type', 'creation_date'], name='film_work_type_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='filmwork',
+            index=models.Index(fields=['creation_date', 'id'], name='film_work_creation_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='filmwork',
+            index=models.Index(fields=['rating', 'id'], name='film_work_rating_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='filmwork',
+            index=models.Index(fields=['title', 'id'], name='film_work_title_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='person',
+            index=models.Index(fields=['full_name', 'id'], name='person_full_name_idx'),
+        ),
+        # В состоянии миграций внешние ключи связующих таблиц называются
+        # film_work_id и genre_id/person_id, и Django добавил бы к колонкам
+        # ещё один суффикс _id. Поэтому индексы создаются SQL по настоящим
+        # колонкам, а состояние обновляется отдельно
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS genre_film_work_genre_idx '
+                'ON content.genre_film_work (genre_id, film_work_id);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS content.genre_film_work_genre_idx;',
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='genrefilmwork',
+                    index=models.Index(fields=['genre_id', 'film_work_id'], name='genre_film_work_genre_idx'),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS person_film_work_person_idx '
+                'ON content.person_film_work (person_id, film_work_id);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS content.person_film_work_person_idx;',
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='personfilmwork',
+                    index=models.Index(fields=['person_id', 'film_work_id'], name='person_film_work_person_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -1,4 +1,6 @@
 import uuid
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
@@ -22,6 +24,8 @@ class UUIDMixin(models.Model):
 class Genre(UUIDMixin, TimeStampedMixin):
     name = models.CharField(_('Name'), max_length=100)
     description = models.TextField(_('Description'), blank=True)
+    # Заполняется триггером, см. миграцию 0003
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -30,10 +34,16 @@ class Genre(UUIDMixin, TimeStampedMixin):
         db_table = "content\".\"genre"
         verbose_name = _('genre')
         verbose_name_plural = _('Genres')
+        indexes = [
+            GinIndex(fields=['search_vector'], name='genre_search_idx'),
+            GinIndex(fields=['name'], name='genre_name_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+        ]
 
 
 class Person(UUIDMixin, TimeStampedMixin):
     full_name = models.CharField(_('Full name'), max_length=255)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return self.full_name
@@ -42,6 +52,13 @@ class Person(UUIDMixin, TimeStampedMixin):
         db_table = "content\".\"person"
         verbose_name = _('Person')
         verbose_name_plural = _('Persons')
+        indexes = [
+            GinIndex(fields=['search_vector'], name='person_search_idx'),
+            GinIndex(fields=['full_name'], name='person_full_name_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+            models.Index(fields=['full_name', 'id'],
+                         name='person_full_name_idx'),
+        ]
 
 
 class Filmwork(UUIDMixin, TimeStampedMixin):
@@ -64,6 +81,7 @@ class Filmwork(UUIDMixin, TimeStampedMixin):
                                  upload_to='movies/')
     genres = models.ManyToManyField(Genre, through='GenreFilmwork')
     persons = models.ManyToManyField(Person, through='PersonFilmwork')
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return self.title
@@ -72,6 +90,18 @@ class Filmwork(UUIDMixin, TimeStampedMixin):
         db_table = "content\".\"film_work"
         verbose_name = _('Filmwork')
         verbose_name_plural = _('Filmworks')
+        indexes = [
+            GinIndex(fields=['search_vector'], name='film_work_search_idx'),
+            # Фильтры и сортировки списка в админке
+            models.Index(fields=['type', 'creation_date'],
+                         name='film_work_type_date_idx'),
+            models.Index(fields=['creation_date', 'id'],
+                         name='film_work_creation_date_idx'),
+            models.Index(fields=['rating', 'id'],
+                         name='film_work_rating_idx'),
+            models.Index(fields=['title', 'id'],
+                         name='film_work_title_idx'),
+        ]
 
 
 class GenreFilmwork(UUIDMixin):
@@ -84,6 +114,8 @@ class GenreFilmwork(UUIDMixin):
         indexes = [
             models.Index(fields=['film_work_id', 'genre_id'],
                          name='film_work_genre_idx'),
+            models.Index(fields=['genre_id', 'film_work_id'],
+                         name='genre_film_work_genre_idx'),
         ]
         unique_together = ['film_work_id', 'genre_id']
 
@@ -105,5 +137,7 @@ class PersonFilmwork(UUIDMixin):
         indexes = [
             models.Index(fields=['film_work_id', 'person_id', 'role'],
                          name='film_work_person_idx'),
+            models.Index(fields=['person_id', 'film_work_id'],
+                         name='person_film_work_person_idx'),
         ]
         unique_together = ['film_work_id', 'person_id', 'role']
@@ -0,0 +1,216 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from django.forms.models import BaseInlineFormSet
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор для больших таблиц без COUNT(*) на каждую страницу.
+    Без фильтров берёт оценку числа строк из pg_class.reltuples,
+    с фильтрами считает не дальше порога, а если строк больше,
+    кеширует полный подсчёт на ADMIN_COUNT_CACHE_TTL секунд.
+    Небольшие таблицы и выборки считаются точно"""
+
+    @cached_property
+    def count(self):
+        threshold = settings.ADMIN_EXACT_COUNT_THRESHOLD
+        query = self.object_list.query
+        if not query.where:
+            estimate = self._estimate(query)
+            if estimate >= threshold:
+                return estimate
+            return self.object_list.count()
+        # Подсчёт с LIMIT останавливается на пороге
+        capped = self.object_list.order_by()[:threshold + 1].count()
+        if capped <= threshold:
+            return capped
+        return cache.get_or_set(self._cache_key(query),
+                                self.object_list.count,
+                                settings.ADMIN_COUNT_CACHE_TTL)
+
+    def _estimate(self, query) -> int:
+        connection = connections[self.object_list.db]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [connection.ops.quote_name(query.model._meta.db_table)]
+            )
+            # -1, если таблицу ещё ни разу не анализировали
+            return max(cursor.fetchone()[0], 0)
+
+    @staticmethod
+    def _cache_key(query) -> str:
+        sql, params = query.sql_with_params()
+        digest = hashlib.md5(repr((sql, params)).encode('utf-8')).hexdigest()
+        return f'admin_count:{digest}'
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Формы инлайна только для одной страницы связанных записей.
+    Номер страницы берётся из параметра page_param строки запроса,
+    форма отправляется на тот же адрес, поэтому при сохранении
+    формы сопоставляются с той же страницей"""
+    per_page = 50
+    page_param = 'page'
+    query = None
+
+    def get_queryset(self):
+        if not hasattr(self, 'page_obj'):
+            paginator = Paginator(super().get_queryset(), self.per_page)
+            number = self.query.get(self.page_param) if self.query else 1
+            self.page_obj = paginator.get_page(number)
+            self._queryset = self.page_obj.object_list
+        return self._queryset
+
+    @property
+    def page_links(self) -> list:
+        """(номер, ссылка) для навигации, без ссылки — текущая страница
+        и пропуски"""
+        links = []
+        paginator = self.page_obj.paginator
+        current = self.page_obj.number
+        for number in paginator.get_elided_page_range(current):
+            if number in (current, paginator.ELLIPSIS):
+                links.append((number, None))
+                continue
+            query = self.query.copy()
+            query[self.page_param] = number
+            links.append((number, f'?{query.urlencode()}'))
+        return links
+
+
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+
+
+class KeysetChangeList(ChangeList):
+    """Список, который листается по ключу (колонка сортировки, id)
+    вместо OFFSET: следующая страница — строки после последней строки
+    текущей, предыдущая — строки перед первой. Цена перехода не зависит
+    от глубины, переходы только на соседние страницы.
+    Включается атрибутом keyset_pagination у ModelAdmin и работает при
+    сортировке по одной колонке модели без NULL, иначе список листается
+    номерами страниц. Не подходит для list_editable"""
+    keyset = False
+    previous_url = next_url = None
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        lookup_params.pop(BEFORE_VAR, None)
+        return lookup_params
+
+    def get_ordering(self, request, queryset):
+        ordering = super().get_ordering(request, queryset)
+        self.keyset_fields = self._keyset_fields(ordering)
+        if not self.keyset_fields:
+            return ordering
+        # Колонка и id в одном направлении, чтобы читать индекс (колонка, id)
+        self.keyset_ordering = [
+            f'-{field.name}' if descending else field.name
+            for field, descending in self.keyset_fields
+        ]
+        return self.keyset_ordering
+
+    def _keyset_fields(self, ordering) -> list:
+        if not getattr(self.model_admin, 'keyset_pagination', False):
+            return []
+        pk = self.lookup_opts.pk
+        descending = True
+        columns = []
+        for part in ordering:
+            if not isinstance(part, str):
+                return []
+            name = part.lstrip('-')
+            columns.append((pk.name if name == 'pk' else name,
+                            part.startswith('-')))
+        while columns and columns[-1][0] == pk.name:
+            descending = columns.pop()[1]
+        if len(columns) > 1:
+            return []
+        fields = []
+        for name, column_descending in columns:
+            try:
+                field = self.lookup_opts.get_field(name)
+            except FieldDoesNotExist:
+                return []
+            if not field.concrete or field.null or field.is_relation:
+                return []
+            fields.append((field, column_descending))
+            descending = column_descending
+        return fields + [(pk, descending)]
+
+    def get_results(self, request):
+        super().get_results(request)
+        # Поиск по сходству мог заменить сортировку
+        self.keyset = (
+            bool(self.keyset_fields) and self.multi_page
+            and not self.show_all
+            and list(self.queryset.query.order_by) == self.keyset_ordering
+        )
+        if not self.keyset:
+            return
+        after = self.params.get(AFTER_VAR)
+        before = self.params.get(BEFORE_VAR)
+        queryset = self.queryset
+        if before is not None:
+            queryset = queryset.reverse()
+        cursor = after if before is None else before
+        if cursor is not None:
+            queryset = queryset.filter(
+                self._keyset_condition(cursor, backward=before is not None)
+            )
+        rows = list(queryset[:self.list_per_page + 1])
+        more = len(rows) > self.list_per_page
+        rows = rows[:self.list_per_page]
+        if before is not None:
+            rows.reverse()
+        self.result_list = rows
+        has_previous = more if before is not None else after is not None
+        has_next = more if before is None else True
+        remove = [AFTER_VAR, BEFORE_VAR, PAGE_VAR]
+        if rows and has_previous:
+            self.previous_url = self.get_query_string(
+                {BEFORE_VAR: self._encode(rows[0])}, remove)
+        if rows and has_next:
+            self.next_url = self.get_query_string(
+                {AFTER_VAR: self._encode(rows[-1])}, remove)
+
+    def _encode(self, obj) -> str:
+        return json.dumps([field.value_to_string(obj)
+                           for field, _ in self.keyset_fields])
+
+    def _keyset_condition(self, cursor: str, backward: bool) -> RawSQL:
+        """(колонка, id) > (значения) как сравнение строк, которое
+        Postgres выполняет одним проходом по индексу"""
+        try:
+            values = json.loads(cursor)
+            if len(values) != len(self.keyset_fields):
+                raise ValueError(cursor)
+            connection = connections[self.queryset.db]
+            values = [field.get_db_prep_value(field.to_python(value),
+                                              connection)
+                      for (field, _), value in zip(self.keyset_fields,
+                                                   values)]
+        except (TypeError, ValueError, ValidationError) as e:
+            raise IncorrectLookupParameters(e)
+        descending = self.keyset_fields[0][1]
+        operator = '<' if descending != backward else '>'
+        quote = connection.ops.quote_name
+        table = quote(self.lookup_opts.db_table)
+        columns = ', '.join(f'{table}.{quote(field.column)}'
+                            for field, _ in self.keyset_fields)
+        placeholders = ', '.join(['%s'] * len(values))
+        return RawSQL(f'({columns}) {operator} ({placeholders})', values,
+                      output_field=BooleanField())
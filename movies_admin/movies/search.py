@@ -0,0 +1,135 @@
+import re
+import uuid
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.contrib.postgres.search import SearchQuery, TrigramSimilarity
+from django.utils.translation import gettext_lazy as _
+
+SEARCH_CONFIGS = ('russian', 'english')
+TRIGRAM_MODE = 'trigram'
+
+
+def parse_uuid(search_term: str):
+    try:
+        return uuid.UUID(search_term)
+    except ValueError:
+        return None
+
+
+def build_search_query(search_term: str) -> SearchQuery:
+    """Запрос в синтаксисе websearch, разобранный русской и английской
+    конфигурациями, как и search_vector"""
+    query = None
+    for config in SEARCH_CONFIGS:
+        part = SearchQuery(search_term, config=config,
+                           search_type='websearch')
+        query = part if query is None else query | part
+    return query
+
+
+def build_prefix_query(search_term: str):
+    """Запрос для autocomplete: каждое слово как префикс,
+    чтобы подсказки появлялись по мере набора"""
+    words = re.findall(r'\w+', search_term)
+    if not words:
+        return None
+    raw = ' & '.join(f'{word}:*' for word in words)
+    query = None
+    for config in SEARCH_CONFIGS:
+        part = SearchQuery(raw, config=config, search_type='raw')
+        query = part if query is None else query | part
+    return query
+
+
+class FullTextSearchMixin:
+    """Поиск в админке по колонке search_vector с GIN-индексом вместо
+    UPPER(...) LIKE '%...%' по search_fields. Строка, похожая на uuid,
+    ищется по первичному ключу. search_fields остаются, чтобы админка
+    показывала строку поиска и работал autocomplete. Запросы autocomplete
+    (параметр term) ищут слова по префиксу"""
+
+    def get_queryset(self, request):
+        # Сам вектор в списках и формах не нужен
+        return super().get_queryset(request).defer('search_vector')
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        pk = parse_uuid(search_term)
+        if pk is not None:
+            return queryset.filter(pk=pk), False
+        if request is not None and 'term' in request.GET:
+            query = build_prefix_query(search_term)
+            if query is None:
+                return queryset.none(), False
+            return queryset.filter(search_vector=query), False
+        return queryset.filter(
+            search_vector=build_search_query(search_term)
+        ), False
+
+
+class SearchModeFilter(admin.SimpleListFilter):
+    """Переключатель режима поиска в боковой панели списка.
+    Сам ничего не фильтрует, режим читает TrigramSearchMixin"""
+    title = _('Search mode')
+    parameter_name = 'search_mode'
+
+    def lookups(self, request, model_admin):
+        return ((TRIGRAM_MODE, _('Similar names')),)
+
+    def queryset(self, request, queryset):
+        return queryset
+
+    def choices(self, changelist):
+        choices = list(super().choices(changelist))
+        choices[0]['display'] = _('Full text')
+        return choices
+
+
+class SimilarityChangeList(ChangeList):
+    """Результаты нечёткого поиска идут по убыванию сходства,
+    пока пользователь не выбрал сортировку по колонке"""
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if ('similarity' in queryset.query.annotations
+                and ORDER_VAR not in self.params):
+            return queryset.order_by('-similarity',
+                                     *queryset.query.order_by)
+        return queryset
+
+
+class TrigramSearchMixin(FullTextSearchMixin):
+    """Нечёткий поиск по trigram_field: строки, похожие на запрос
+    по оператору % (GIN-индекс gin_trgm_ops), не больше
+    ADMIN_TRIGRAM_LIMIT самых похожих, по убыванию сходства.
+    Включается фильтром SearchModeFilter, иначе поиск полнотекстовый"""
+    trigram_field = None
+
+    def trigram_mode(self, request) -> bool:
+        return (request is not None and request.GET.get(
+            SearchModeFilter.parameter_name) == TRIGRAM_MODE)
+
+    def get_changelist(self, request, **kwargs):
+        return SimilarityChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if (not self.trigram_mode(request) or not search_term
+                or parse_uuid(search_term) is not None):
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        similarity = TrigramSimilarity(self.trigram_field, search_term)
+        best = (
+            queryset
+            .filter(**{f'{self.trigram_field}__trigram_similar': search_term})
+            .annotate(similarity=similarity)
+            .order_by('-similarity')
+            .values('pk')[:settings.ADMIN_TRIGRAM_LIMIT]
+        )
+        return queryset.filter(pk__in=best).annotate(
+            similarity=similarity
+        ), False
@@ -0,0 +1,46 @@
+from django.db.models import F
+from django.test import SimpleTestCase
+
+from .models import Filmwork
+from .paginator import KeysetChangeList
+
+
+class KeysetFieldsTest(SimpleTestCase):
+    """Выбор ключа (колонка, id) по сортировке списка"""
+
+    def keyset(self, ordering: list, enabled: bool = True) -> list:
+        changelist = KeysetChangeList.__new__(KeysetChangeList)
+        changelist.model_admin = type('ModelAdmin', (),
+                                      {'keyset_pagination': enabled})
+        changelist.lookup_opts = Filmwork._meta
+        return [(field.name, descending) for field, descending
+                in changelist._keyset_fields(ordering)]
+
+    def test_disabled(self):
+        assert self.keyset(['title', '-pk'], enabled=False) == []
+
+    def test_default_ordering_by_pk(self):
+        assert self.keyset(['-pk']) == [('id', True)]
+
+    def test_id_follows_column_direction(self):
+        assert self.keyset(['title', '-pk']) == [('title', False),
+                                                 ('id', False)]
+        assert self.keyset(['-rating', 'pk']) == [('rating', True),
+                                                  ('id', True)]
+
+    def test_explicit_id_column(self):
+        assert self.keyset(['-creation_date', '-id']) == [
+            ('creation_date', True), ('id', True)
+        ]
+
+    def test_several_columns(self):
+        assert self.keyset(['type', 'title', '-pk']) == []
+
+    def test_expression(self):
+        assert self.keyset([F('title').asc(), '-pk']) == []
+
+    def test_nullable_column(self):
+        assert self.keyset(['file_path', '-pk']) == []
+
+    def test_annotation(self):
+        assert self.keyset(['genre_names', '-pk']) == []
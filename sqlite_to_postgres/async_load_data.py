@@ -0,0 +1,126 @@
+# Асинхронный загрузчик: чтение из SQLite и запись в Postgres
+# идут одновременно. Читатель заполняет ограниченную очередь пачками,
+# писатели разбирают её через пул соединений asyncpg.
+# Размер очереди ограничивает число пачек в памяти
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, fields
+
+import asyncpg
+
+from converters import compile_record_converter
+from load_data import build_conflict_clause
+from models import RowBatch
+from query_for_sqlite import build_query
+from settings import batch_size, dsl, table_is_dataclass
+
+
+def build_async_insert_sql(dclass: dataclass, table: str,
+                           schema: str = 'public') -> str:
+    names = [field.name for field in fields(dclass)]
+    placeholders = ', '.join(f'${number}'
+                             for number in range(1, len(names) + 1))
+    return f"""
+        INSERT INTO {schema}.{table} ({', '.join(names)})
+            VALUES ({placeholders})
+            {build_conflict_clause(dclass)};
+    """
+
+
+async def read_table(connection: sqlite3.Connection, table: str,
+                     queue: asyncio.Queue, batch_size: int, writers: int):
+    """Читает таблицу пачками в отдельном потоке и кладёт их в очередь.
+    Пачки ждут писателей, поэтому хранятся по колонкам в RowBatch"""
+    dclass = table_is_dataclass[table]
+    try:
+        cursor = await asyncio.to_thread(connection.execute,
+                                         build_query(table))
+        convert = compile_record_converter(cursor.description, dclass)
+        while table_data := await asyncio.to_thread(cursor.fetchmany,
+                                                    batch_size):
+            await queue.put(RowBatch(dclass, map(convert, table_data)))
+    except Exception as e:
+        logging.error(e)
+    finally:
+        for _ in range(writers):
+            await queue.put(None)
+
+
+async def write_batches(pool: asyncpg.Pool, sql: str,
+                        queue: asyncio.Queue) -> int:
+    """Записывает пачки из очереди, каждую в своей транзакции"""
+    written = 0
+    while (batch := await queue.get()) is not None:
+        try:
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.executemany(sql, batch.rows())
+            written += len(batch)
+        except Exception as e:
+            logging.error(e)
+    return written
+
+
+async def load_table_async(connection: sqlite3.Connection,
+                           pool: asyncpg.Pool, table: str, batch_size: int,
+                           writers: int, max_in_flight: int) -> int:
+    queue = asyncio.Queue(maxsize=max_in_flight)
+    sql = build_async_insert_sql(table_is_dataclass[table], table,
+                                 'content')
+    results = await asyncio.gather(
+        read_table(connection, table, queue, batch_size, writers),
+        *(write_batches(pool, sql, queue) for _ in range(writers))
+    )
+    return sum(results[1:])
+
+
+async def load_from_sqlite_async(sqlite_path: str, dsl: dict,
+                                 batch_size: int, writers: int,
+                                 max_in_flight: int):
+    """Основной метод асинхронной загрузки данных из SQLite в Postgres"""
+    # Соединение используется из потоков asyncio.to_thread,
+    # но всегда только одним из них одновременно
+    connection = sqlite3.connect(sqlite_path, check_same_thread=False)
+    try:
+        async with asyncpg.create_pool(
+                database=dsl['dbname'], user=dsl['user'],
+                password=dsl['password'], host=dsl['host'],
+                port=int(dsl['port']) if dsl['port'] else None,
+                min_size=writers, max_size=writers) as pool:
+            for table in table_is_dataclass:
+                started = time.monotonic()
+                written = await load_table_async(
+                    connection, pool, table, batch_size, writers,
+                    max_in_flight
+                )
+                logging.info('%s: %d rows loaded in %.2f s', table,
+                             written, time.monotonic() - started)
+    finally:
+        connection.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Асинхронный перенос данных из SQLite в Postgres'
+    )
+    parser.add_argument('--batch-size', type=int, default=batch_size)
+    parser.add_argument('--writers', type=int, default=4,
+                        help='число параллельных писателей в Postgres')
+    parser.add_argument('--max-in-flight', type=int, default=8,
+                        help='максимум пачек в очереди между чтением '
+                             'и записью')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    logging.basicConfig(format='%(process)d-%(levelname)s-%(message)s',
+                        level=logging.INFO)
+    asyncio.run(load_from_sqlite_async(
+        os.environ.get('PATH_TO_SQLITE'), dsl, args.batch_size,
+        args.writers, args.max_in_flight
+    ))
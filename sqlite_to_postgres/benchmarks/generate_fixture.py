@@ -0,0 +1,182 @@
+# Генератор синтетической базы SQLite со схемой, которую ожидает
+# query_for_sqlite. Запуск из каталога sqlite_to_postgres:
+#   python -m benchmarks.generate_fixture --scale=small bench.sqlite
+import argparse
+import random
+import sqlite3
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# Число кинопроизведений для каждого масштаба
+SCALES = {
+    'small': 10_000,
+    'medium': 1_000_000,
+    'large': 10_000_000,
+}
+GENRES = 30
+# Персон примерно вдвое меньше, чем фильмов,
+# у фильма 1–3 жанра и в среднем 8 участников
+PERSONS_PER_FILM = 0.5
+GENRES_PER_FILM = (1, 3)
+PERSONS_PER_FILM_WORK = (2, 14)
+ROLES = ('actor', 'actor', 'actor', 'writer', 'director')
+CHUNK = 10_000
+
+SCHEMA = """
+CREATE TABLE film_work (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    creation_date DATE,
+    file_path TEXT,
+    rating FLOAT,
+    type TEXT NOT NULL,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone
+);
+CREATE TABLE genre (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone
+);
+CREATE TABLE person (
+    id TEXT PRIMARY KEY,
+    full_name TEXT NOT NULL,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone
+);
+CREATE TABLE genre_film_work (
+    id TEXT PRIMARY KEY,
+    film_work_id TEXT NOT NULL,
+    genre_id TEXT NOT NULL,
+    created_at timestamp with time zone
+);
+CREATE TABLE person_film_work (
+    id TEXT PRIMARY KEY,
+    film_work_id TEXT NOT NULL,
+    person_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    created_at timestamp with time zone
+);
+"""
+
+
+class FixtureGenerator:
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.epoch = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def timestamp(self) -> str:
+        moment = self.epoch + timedelta(
+            seconds=self.rng.randrange(365 * 86400),
+            microseconds=self.rng.randrange(1_000_000)
+        )
+        return moment.strftime('%Y-%m-%d %H:%M:%S.%f') + '+00'
+
+    def genres(self):
+        for number in range(GENRES):
+            created = self.timestamp()
+            yield (self.uuid(), f'Genre {number}', f'About genre {number}',
+                   created, created)
+
+    def persons(self, count: int):
+        for number in range(count):
+            created = self.timestamp()
+            yield self.uuid(), f'Person {number}', created, created
+
+    def film_works(self, count: int):
+        for number in range(count):
+            created = self.timestamp()
+            yield (self.uuid(), f'Film {number}',
+                   f'Description of film {number}', self.timestamp(), None,
+                   round(self.rng.uniform(0, 10), 1),
+                   self.rng.choice(('movie', 'tv_show')), created, created)
+
+    def genre_links(self, film_ids: list, genre_ids: list):
+        for film_id in film_ids:
+            for genre_id in self.rng.sample(
+                    genre_ids, self.rng.randint(*GENRES_PER_FILM)):
+                yield self.uuid(), film_id, genre_id, self.timestamp()
+
+    def person_links(self, film_ids: list, person_count: int,
+                     person_ids: list):
+        # Участники фильма различны: в Postgres связь уникальна
+        # по (film_work_id, person_id, role)
+        for film_id in film_ids:
+            cast = min(self.rng.randint(*PERSONS_PER_FILM_WORK),
+                       person_count)
+            for position in self.rng.sample(range(person_count), cast):
+                yield (self.uuid(), film_id, person_ids[position],
+                       self.rng.choice(ROLES), self.timestamp())
+
+
+def insert_chunks(connection: sqlite3.Connection, sql: str, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK:
+            connection.executemany(sql, chunk)
+            chunk.clear()
+    if chunk:
+        connection.executemany(sql, chunk)
+
+
+def generate(path: str, film_count: int, seed: int = 0):
+    generator = FixtureGenerator(seed)
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode = OFF')
+    connection.execute('PRAGMA synchronous = OFF')
+    connection.executescript(SCHEMA)
+    genres = list(generator.genres())
+    insert_chunks(connection,
+                  'insert into genre values (?, ?, ?, ?, ?)', genres)
+    person_ids = []
+    person_count = max(int(film_count * PERSONS_PER_FILM), 1)
+
+    def persons():
+        for row in generator.persons(person_count):
+            person_ids.append(row[0])
+            yield row
+    insert_chunks(connection,
+                  'insert into person values (?, ?, ?, ?)', persons())
+    genre_ids = [row[0] for row in genres]
+    # Фильмы пишутся порциями, чтобы не держать все id в памяти
+    remaining = film_count
+    while remaining:
+        films = list(generator.film_works(min(CHUNK, remaining)))
+        remaining -= len(films)
+        connection.executemany(
+            'insert into film_work values (?, ?, ?, ?, ?, ?, ?, ?, ?)', films
+        )
+        film_ids = [row[0] for row in films]
+        insert_chunks(connection,
+                      'insert into genre_film_work values (?, ?, ?, ?)',
+                      generator.genre_links(film_ids, genre_ids))
+        insert_chunks(connection,
+                      'insert into person_film_work values (?, ?, ?, ?, ?)',
+                      generator.person_links(film_ids, person_count,
+                                             person_ids))
+    connection.commit()
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Синтетическая база SQLite для бенчмарков загрузчика'
+    )
+    parser.add_argument('path')
+    parser.add_argument('--scale', choices=list(SCALES), default='small')
+    parser.add_argument('--films', type=int,
+                        help='точное число фильмов вместо --scale')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.path, args.films or SCALES[args.scale], args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Сравнение памяти на строку для разных способов хранения пачки.
+# Запуск из каталога sqlite_to_postgres:
+#   python -m benchmarks.models_memory --rows 100000
+import argparse
+import json
+import tracemalloc
+import uuid
+from dataclasses import fields, make_dataclass
+
+from models import Filmwork, RowBatch
+
+
+def sample_rows(count: int):
+    for number in range(count):
+        yield (str(uuid.uuid4()), f'Title {number}', 'Description',
+               '2021-06-16 20:14:09.221838+00', 7.5, 'movie', '', None,
+               '2021-06-16 20:14:09.221838+00',
+               '2021-06-16 20:14:09.221838+00')
+
+
+def measure(build, rows: list) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    container = build(rows)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del container
+    return used / len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+    # Значения строк создаются заранее, измеряется только контейнер
+    rows = list(sample_rows(args.rows))
+    dict_filmwork = make_dataclass(
+        'DictFilmwork', [(field.name, field.type) for field in
+                         fields(Filmwork)]
+    )
+    results = {
+        'dict_dataclass': measure(
+            lambda data: [dict_filmwork(*row) for row in data], rows),
+        'slots_dataclass': measure(
+            lambda data: [Filmwork(*row) for row in data], rows),
+        'tuples': measure(
+            lambda data: [(*row,) for row in data], rows),
+        'row_batch': measure(
+            lambda data: RowBatch(Filmwork, data), rows),
+    }
+    results['saved_by_slots'] = (results['dict_dataclass']
+                                 - results['slots_dataclass'])
+    results['saved_by_row_batch'] = (results['dict_dataclass']
+                                     - results['row_batch'])
+    print(json.dumps({key: round(value, 1)
+                      for key, value in results.items()}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
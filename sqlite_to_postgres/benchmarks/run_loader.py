@@ -0,0 +1,113 @@
+# Замер пропускной способности загрузчика в разных режимах.
+# Каждый режим запускается отдельным процессом на очищенной схеме content,
+# результат пишется в JSON для отслеживания регрессий.
+# Запуск из каталога sqlite_to_postgres:
+#   python -m benchmarks.run_loader --scale=small --output=bench.json
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from benchmarks.generate_fixture import SCALES, generate
+from load_data import conn_context_pg
+from settings import dsl, table_is_dataclass
+
+MODES = {
+    'insert': ['load_data.py', '--mode=insert'],
+    'copy-text': ['load_data.py', '--mode=copy', '--copy-format=text'],
+    'copy-binary': ['load_data.py', '--mode=copy', '--copy-format=binary'],
+    'copy-parallel': ['load_data.py', '--mode=copy', '--copy-format=binary',
+                      '--jobs=8', '--workers-per-table=4'],
+    'copy-immutable': ['load_data.py', '--mode=copy',
+                       '--copy-format=binary', '--immutable-source'],
+    'async': ['async_load_data.py'],
+}
+TIMING = re.compile(r'(\w+)(?:: \d+ rows)? loaded in ([\d.]+) s')
+
+
+def reset_target():
+    """Очищает таблицы content и состояние загрузчика"""
+    with conn_context_pg(dsl) as pg_conn:
+        cursor = pg_conn.cursor()
+        cursor.execute(f"""
+            TRUNCATE {', '.join(f'content.{table}'
+                                for table in table_is_dataclass)};
+            DROP TABLE IF EXISTS public.loader_checkpoint,
+                public.loader_watermark;
+        """)
+        pg_conn.commit()
+
+
+def count_rows() -> dict:
+    with conn_context_pg(dsl) as pg_conn:
+        cursor = pg_conn.cursor()
+        counts = {}
+        for table in table_is_dataclass:
+            cursor.execute(f'SELECT count(*) FROM content.{table};')
+            counts[table] = cursor.fetchone()[0]
+    return counts
+
+
+def run_mode(mode: str, sqlite_path: str, batch_size: int) -> dict:
+    """Запускает загрузчик и собирает время, пиковую память и
+    время по таблицам из его лога.
+    Пиковая память учитывает только главный процесс загрузчика"""
+    reset_target()
+    env = dict(os.environ, PATH_TO_SQLITE=sqlite_path)
+    command = [sys.executable, *MODES[mode], f'--batch-size={batch_size}']
+    started = time.monotonic()
+    process = subprocess.Popen(command, env=env, stderr=subprocess.PIPE,
+                               text=True)
+    log = process.stderr.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.monotonic() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    rows = count_rows()
+    total = sum(rows.values())
+    return {
+        'exit_status': process.returncode,
+        'seconds': round(elapsed, 3),
+        'rows': rows,
+        'rows_per_second': round(total / elapsed, 1) if elapsed else None,
+        'peak_rss_kb': usage.ru_maxrss,
+        'tables': {table: float(seconds)
+                   for table, seconds in TIMING.findall(log)
+                   if table in table_is_dataclass},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Бенчмарк режимов загрузки SQLite -> Postgres'
+    )
+    parser.add_argument('--scale', choices=list(SCALES), default='small')
+    parser.add_argument('--sqlite',
+                        help='готовая база, иначе будет сгенерирована')
+    parser.add_argument('--mode', action='append', choices=list(MODES),
+                        help='режимы для замера, по умолчанию все')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--output', help='файл JSON, по умолчанию stdout')
+    args = parser.parse_args()
+    sqlite_path = args.sqlite or f'bench_{args.scale}.sqlite'
+    if not os.path.exists(sqlite_path):
+        generate(sqlite_path, SCALES[args.scale])
+    results = {
+        'scale': args.scale,
+        'sqlite': sqlite_path,
+        'batch_size': args.batch_size,
+        'modes': {mode: run_mode(mode, sqlite_path, args.batch_size)
+                  for mode in args.mode or MODES},
+    }
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# Замер полного чтения таблиц SQLite обычным соединением и соединением
+# с immutable=1, mmap и большим кешем страниц, без записи в Postgres.
+# Перед каждым прогоном кеш страниц ОС можно сбросить (--drop-caches,
+# нужен root), иначе второй прогон читает файл из памяти.
+# Запуск из каталога sqlite_to_postgres:
+#   python -m benchmarks.sqlite_scan --sqlite=bench_large.sqlite
+import argparse
+import json
+import os
+import subprocess
+import time
+
+from benchmarks.generate_fixture import SCALES, generate
+from load_data import conn_context_sqlite
+from query_for_sqlite import build_query
+from settings import batch_size, table_is_dataclass
+
+CONNECTIONS = {
+    'plain': False,
+    'immutable': True,
+}
+
+
+def drop_caches():
+    subprocess.run(['sync'], check=True)
+    with open('/proc/sys/vm/drop_caches', 'w') as caches:
+        caches.write('3\n')
+
+
+def scan(sqlite_path: str, immutable: bool, batch_size: int) -> dict:
+    """Читает все таблицы так же, как загрузчик: кортежами пачками
+    по batch_size в порядке rowid"""
+    tables = {}
+    with conn_context_sqlite(sqlite_path, immutable) as sqlite_conn:
+        for table in table_is_dataclass:
+            cursor = sqlite_conn.cursor()
+            cursor.row_factory = None
+            started = time.monotonic()
+            rows = 0
+            cursor.execute(build_query(table))
+            while table_data := cursor.fetchmany(batch_size):
+                rows += len(table_data)
+            elapsed = time.monotonic() - started
+            tables[table] = {
+                'rows': rows,
+                'seconds': round(elapsed, 3),
+                'rows_per_second': round(rows / elapsed, 1)
+                if elapsed else None,
+            }
+    return tables
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Бенчмарк полного чтения таблиц SQLite'
+    )
+    parser.add_argument('--scale', choices=list(SCALES), default='small')
+    parser.add_argument('--sqlite',
+                        help='готовая база, иначе будет сгенерирована')
+    parser.add_argument('--batch-size', type=int, default=batch_size)
+    parser.add_argument('--drop-caches', action='store_true',
+                        help='сбрасывать кеш страниц ОС перед прогоном')
+    parser.add_argument('--output', help='файл JSON, по умолчанию stdout')
+    args = parser.parse_args()
+    sqlite_path = args.sqlite or f'bench_{args.scale}.sqlite'
+    if not os.path.exists(sqlite_path):
+        generate(sqlite_path, SCALES[args.scale])
+    results = {
+        'sqlite': sqlite_path,
+        'size_bytes': os.path.getsize(sqlite_path),
+        'batch_size': args.batch_size,
+        'connections': {},
+    }
+    for name, immutable in CONNECTIONS.items():
+        if args.drop_caches:
+            drop_caches()
+        started = time.monotonic()
+        tables = scan(sqlite_path, immutable, args.batch_size)
+        results['connections'][name] = {
+            'seconds': round(time.monotonic() - started, 3),
+            'tables': tables,
+        }
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# Состояние загрузки в Postgres:
+# - контрольные точки: последний перенесённый rowid для каждой таблицы
+#   (или диапазона rowid в ней), фиксируются в одной транзакции с данными;
+# - водяные знаки: максимальное время изменения строк, перенесённых
+#   последней успешной синхронизацией таблицы
+from psycopg2.extensions import connection as _connection
+
+from converters import parse_timestamp
+
+CHECKPOINT_TABLE = 'public.loader_checkpoint'
+WATERMARK_TABLE = 'public.loader_watermark'
+
+
+class Watermark:
+    """Наибольшее время изменения среди прочитанных строк таблицы.
+    Считается по ходу чтения, без отдельного прохода по источнику.
+    Объект передаётся между процессами, поэтому хранит только значение"""
+
+    def __init__(self, value=None):
+        self.value = value
+
+    def update(self, value):
+        if value is None:
+            return
+        if self.value is None or \
+                parse_timestamp(value) > parse_timestamp(self.value):
+            self.value = value
+
+
+def checkpoint_key(table: str, rowid_range: tuple = None) -> str:
+    if rowid_range is None:
+        return table
+    return f'{table}:{rowid_range[0]}-{rowid_range[1]}'
+
+
+def ensure_checkpoint_table(pg_conn: _connection):
+    cursor = pg_conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+            name text PRIMARY KEY,
+            last_rowid bigint NOT NULL,
+            modified timestamp with time zone NOT NULL DEFAULT now()
+        );
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            name text PRIMARY KEY,
+            value text NOT NULL,
+            modified timestamp with time zone NOT NULL DEFAULT now()
+        );
+    """)
+    pg_conn.commit()
+
+
+def read_checkpoint(pg_conn: _connection, key: str):
+    cursor = pg_conn.cursor()
+    cursor.execute(
+        f'SELECT last_rowid FROM {CHECKPOINT_TABLE} WHERE name = %s;',
+        (key,)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def save_checkpoint(pg_conn: _connection, key: str, last_rowid: int):
+    """Сохраняет точку без commit: её фиксирует загрузчик вместе с пачкой"""
+    cursor = pg_conn.cursor()
+    cursor.execute(f"""
+        INSERT INTO {CHECKPOINT_TABLE} (name, last_rowid)
+            VALUES (%s, %s)
+            ON CONFLICT (name) DO UPDATE
+            SET last_rowid = EXCLUDED.last_rowid, modified = now();
+    """, (key, last_rowid))
+
+
+def read_watermark(pg_conn: _connection, table: str):
+    cursor = pg_conn.cursor()
+    cursor.execute(
+        f'SELECT value FROM {WATERMARK_TABLE} WHERE name = %s;',
+        (table,)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def save_watermark(pg_conn: _connection, table: str, value: str):
+    cursor = pg_conn.cursor()
+    cursor.execute(f"""
+        INSERT INTO {WATERMARK_TABLE} (name, value)
+            VALUES (%s, %s)
+            ON CONFLICT (name) DO UPDATE
+            SET value = EXCLUDED.value, modified = now();
+    """, (table, value))
@@ -0,0 +1,2 @@
+# Каталог sqlite_to_postgres попадает в sys.path, и тесты
+# импортируют модули загрузчика напрямую
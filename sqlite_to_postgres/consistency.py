@@ -0,0 +1,194 @@
+# Проверка согласованности данных SQLite и Postgres по контрольным суммам.
+# Строки нормализуются одинаково на обеих сторонах и группируются
+# в корзины по префиксу id. Для каждой корзины сравниваются число строк
+# и сумма хешей строк, построчно сверяются только несовпавшие корзины
+import hashlib
+import sqlite3
+import uuid
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+
+from psycopg2.extensions import connection as _connection
+
+from converters import parse_timestamp
+from query_for_sqlite import build_query
+from settings import table_is_dataclass
+
+NULL = '\\N'
+SEPARATOR = '\x1f'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+PG_TIMESTAMP_FORMAT = 'YYYY-MM-DD HH24:MI:SS.US'
+
+
+@dataclass
+class TableDiff:
+    table: str
+    missing: list = field(default_factory=list)
+    extra: list = field(default_factory=list)
+    changed: list = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing or self.extra or self.changed)
+
+
+def _normalize_uuid(value) -> str:
+    return str(value).lower()
+
+
+def _normalize_float(value) -> str:
+    return f'{float(value):.6f}'
+
+
+def _normalize_timestamp(value) -> str:
+    return parse_timestamp(value).astimezone(timezone.utc)\
+        .strftime(TIMESTAMP_FORMAT)
+
+
+SQLITE_NORMALIZERS = {
+    uuid.UUID: _normalize_uuid,
+    str: str,
+    float: _normalize_float,
+    datetime: _normalize_timestamp,
+}
+
+PG_NORMALIZERS = {
+    uuid.UUID: '{}::text',
+    str: '{}::text',
+    float: 'round({}::numeric, 6)::text',
+    datetime: f"to_char({{}}::timestamptz, '{PG_TIMESTAMP_FORMAT}')",
+}
+
+
+def row_hash(text: str) -> int:
+    """Первые 64 бита md5 как знаковое целое, как ('x' || ...)::bit(64)
+    ::bigint в Postgres"""
+    value = int(hashlib.md5(text.encode('utf-8')).hexdigest()[:16], 16)
+    return value - 2 ** 64 if value >= 2 ** 63 else value
+
+
+def pg_row_text(dclass: dataclass) -> str:
+    """SQL-выражение нормализованной строки таблицы в Postgres"""
+    parts = (f"coalesce({PG_NORMALIZERS[column.type].format(column.name)},"
+             f" '{NULL}')" for column in fields(dclass))
+    return f"concat_ws(chr(31), {', '.join(parts)})"
+
+
+def pg_row_hash(dclass: dataclass) -> str:
+    return f"('x' || left(md5({pg_row_text(dclass)}), 16))::bit(64)::bigint"
+
+
+def compile_sqlite_row_text(description: tuple, dclass: dataclass):
+    """Строка SQLite -> нормализованная строка, как pg_row_text"""
+    names = [column[0] for column in description]
+    columns = [(names.index(column.name), SQLITE_NORMALIZERS[column.type])
+               for column in fields(dclass)]
+
+    def row_text(row) -> str:
+        return SEPARATOR.join(
+            NULL if (value := row[position]) is None else normalize(value)
+            for position, normalize in columns
+        )
+    return row_text
+
+
+def prefix_bounds(prefix: str) -> tuple:
+    """Границы uuid с заданным префиксом для поиска по индексу"""
+    low = (prefix + '0' * 32)[:32]
+    high = (prefix + 'f' * 32)[:32]
+    return str(uuid.UUID(low)), str(uuid.UUID(high))
+
+
+def _sqlite_rows(connection: sqlite3.Connection, table: str):
+    """Пары (id, хеш строки) из SQLite"""
+    dclass = table_is_dataclass[table]
+    cursor = connection.cursor()
+    cursor.row_factory = None
+    cursor.execute(build_query(table))
+    row_text = compile_sqlite_row_text(cursor.description, dclass)
+    id_position = [column[0] for column in cursor.description].index('id')
+    for row in cursor:
+        yield row[id_position].lower(), row_hash(row_text(row))
+
+
+def sqlite_buckets(connection: sqlite3.Connection, table: str,
+                   prefix_length: int) -> dict:
+    """{префикс id: (число строк, сумма хешей)} за один проход по SQLite"""
+    buckets = {}
+    for row_id, hashed in _sqlite_rows(connection, table):
+        count, total = buckets.get(row_id[:prefix_length], (0, 0))
+        buckets[row_id[:prefix_length]] = (count + 1, total + hashed)
+    return buckets
+
+
+def sqlite_bucket_rows(connection: sqlite3.Connection, table: str,
+                       prefixes: set, prefix_length: int) -> dict:
+    """{префикс id: {id: хеш строки}} для корзин prefixes за один проход.
+    id в SQLite может быть в любом регистре, а отбор по lower(id)
+    не использует индекс, поэтому корзины не читаются по отдельности"""
+    rows = {prefix: {} for prefix in prefixes}
+    for row_id, hashed in _sqlite_rows(connection, table):
+        bucket = rows.get(row_id[:prefix_length])
+        if bucket is not None:
+            bucket[row_id] = hashed
+    return rows
+
+
+def pg_buckets(pg_conn: _connection, table: str, prefix_length: int,
+               schema: str = 'content') -> dict:
+    """{префикс id: (число строк, сумма хешей)}, считается в Postgres"""
+    dclass = table_is_dataclass[table]
+    cursor = pg_conn.cursor()
+    cursor.execute("SET TIME ZONE 'UTC';")
+    cursor.execute(f"""
+        SELECT left(id::text, %s), count(*), sum({pg_row_hash(dclass)})
+            FROM {schema}.{table}
+            GROUP BY 1;
+    """, (prefix_length,))
+    return {prefix: (count, int(total))
+            for prefix, count, total in cursor.fetchall()}
+
+
+def _pg_rows(pg_conn: _connection, table: str, prefix: str,
+             schema: str = 'content') -> dict:
+    dclass = table_is_dataclass[table]
+    cursor = pg_conn.cursor()
+    cursor.execute(f"""
+        SELECT id::text, {pg_row_hash(dclass)}
+            FROM {schema}.{table}
+            WHERE id BETWEEN %s AND %s;
+    """, prefix_bounds(prefix))
+    return dict(cursor.fetchall())
+
+
+def compare_table(connection: sqlite3.Connection, pg_conn: _connection,
+                  table: str, prefix_length: int = 2,
+                  schema: str = 'content') -> TableDiff:
+    """Сравнивает таблицу по корзинам и сверяет построчно только
+    корзины с расхождениями"""
+    diff = TableDiff(table)
+    source = sqlite_buckets(connection, table, prefix_length)
+    target = pg_buckets(pg_conn, table, prefix_length, schema)
+    mismatched = sorted(prefix for prefix in source.keys() | target.keys()
+                        if source.get(prefix) != target.get(prefix))
+    if not mismatched:
+        return diff
+    source_buckets = sqlite_bucket_rows(connection, table, set(mismatched),
+                                        prefix_length)
+    for prefix in mismatched:
+        source_rows = source_buckets[prefix]
+        target_rows = _pg_rows(pg_conn, table, prefix, schema)
+        diff.missing.extend(sorted(source_rows.keys() - target_rows.keys()))
+        diff.extra.extend(sorted(target_rows.keys() - source_rows.keys()))
+        diff.changed.extend(sorted(
+            row_id for row_id in source_rows.keys() & target_rows.keys()
+            if source_rows[row_id] != target_rows[row_id]
+        ))
+    return diff
+
+
+def compare_all(connection: sqlite3.Connection, pg_conn: _connection,
+                prefix_length: int = 2, schema: str = 'content') -> dict:
+    return {table: compare_table(connection, pg_conn, table,
+                                 prefix_length, schema)
+            for table in table_is_dataclass}
@@ -0,0 +1,187 @@
+# Преобразование строк SQLite в формат, нужный Postgres.
+# Преобразователи собираются один раз на таблицу по аннотациям
+# датаклассов из models.py и работают с кортежами без промежуточных объектов
+import struct
+import uuid
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+from operator import itemgetter
+
+PG_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+TEXT_NULL = '\\N'
+TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t',
+                              '\n': '\\n', '\r': '\\r'})
+BINARY_NULL = struct.pack('!i', -1)
+
+
+def column_positions(description: tuple, dclass: dataclass) -> list:
+    """Номера колонок выборки в порядке полей датакласса"""
+    names = [column[0] for column in description]
+    return [names.index(field.name) for field in fields(dclass)]
+
+
+def parse_timestamp(value) -> datetime:
+    if isinstance(value, datetime):
+        result = value
+    else:
+        # SQLite хранит смещение как '+00', fromisoformat до Python 3.11
+        # понимает только '+00:00'
+        if len(value) > 10 and value[-3:-2] in ('+', '-'):
+            value += ':00'
+        result = datetime.fromisoformat(value)
+    if result.tzinfo is None:
+        result = result.replace(tzinfo=timezone.utc)
+    return result
+
+
+def _text_plain(value) -> str:
+    return str(value)
+
+
+def _text_escaped(value) -> str:
+    return str(value).translate(TEXT_ESCAPES)
+
+
+def _text_float(value) -> str:
+    return repr(float(value))
+
+
+def _binary_uuid(value) -> bytes:
+    return uuid.UUID(str(value)).bytes
+
+
+def _binary_text(value) -> bytes:
+    return str(value).encode('utf-8')
+
+
+def _binary_float(value) -> bytes:
+    return struct.pack('!d', float(value))
+
+
+def _binary_timestamp(value) -> bytes:
+    delta = parse_timestamp(value) - PG_EPOCH
+    micro = (delta.days * 86400 + delta.seconds) * 1000000 \
+        + delta.microseconds
+    return struct.pack('!q', micro)
+
+
+# uuid и время в текстовом виде не содержат спецсимволов COPY
+TEXT_CONVERTERS = {
+    uuid.UUID: _text_plain,
+    str: _text_escaped,
+    float: _text_float,
+    datetime: _text_plain,
+}
+
+# asyncpg принимает uuid строкой, а время только объектами datetime
+RECORD_CONVERTERS = {
+    float: float,
+    datetime: parse_timestamp,
+}
+
+BINARY_CONVERTERS = {
+    uuid.UUID: _binary_uuid,
+    str: _binary_text,
+    float: _binary_float,
+    datetime: _binary_timestamp,
+}
+
+
+def _check_uuid(value):
+    uuid.UUID(str(value))
+
+
+def _check_text(value):
+    if not isinstance(value, str):
+        raise TypeError(f'expected str, got {type(value).__name__}')
+
+
+# Проверки значений перед записью: то, что Postgres не примет
+# в колонку этого типа
+VALIDATORS = {
+    uuid.UUID: _check_uuid,
+    str: _check_text,
+    float: float,
+    datetime: parse_timestamp,
+}
+
+
+def compile_tuple_converter(description: tuple, dclass: dataclass):
+    """Строка SQLite -> кортеж значений в порядке полей датакласса"""
+    positions = column_positions(description, dclass)
+    if len(positions) == 1:
+        position = positions[0]
+        return lambda row: (row[position],)
+    return itemgetter(*positions)
+
+
+def compile_validator(dclass: dataclass):
+    """Проверка кортежа в порядке полей датакласса.
+    Возвращает текст первой ошибки или None, если строка корректна"""
+    checks = [(field.name, VALIDATORS[field.type])
+              for field in fields(dclass)]
+
+    def validate(row) -> str:
+        for (name, check), value in zip(checks, row):
+            if value is None:
+                continue
+            try:
+                check(value)
+            except (TypeError, ValueError) as e:
+                return f'{name}: {e}'
+        return None
+    return validate
+
+
+def compile_record_converter(description: tuple, dclass: dataclass):
+    """Строка SQLite -> кортеж с типами Python для asyncpg"""
+    columns = list(zip(column_positions(description, dclass),
+                       (RECORD_CONVERTERS.get(field.type)
+                        for field in fields(dclass))))
+
+    def convert(row) -> tuple:
+        values = []
+        for position, converter in columns:
+            value = row[position]
+            if converter is not None and value is not None:
+                value = converter(value)
+            values.append(value)
+        return tuple(values)
+    return convert
+
+
+def compile_text_converter(description: tuple, dclass: dataclass):
+    """Строка SQLite -> строка текстового формата COPY"""
+    columns = list(zip(column_positions(description, dclass),
+                       (TEXT_CONVERTERS[field.type]
+                        for field in fields(dclass))))
+
+    def convert(row) -> str:
+        return '\t'.join(
+            TEXT_NULL if (value := row[position]) is None
+            else converter(value)
+            for position, converter in columns
+        ) + '\n'
+    return convert
+
+
+def compile_binary_converter(description: tuple, dclass: dataclass):
+    """Строка SQLite -> кортеж бинарного формата COPY"""
+    columns = list(zip(column_positions(description, dclass),
+                       (BINARY_CONVERTERS[field.type]
+                        for field in fields(dclass))))
+    field_count = struct.pack('!h', len(columns))
+    pack_length = struct.Struct('!i').pack
+
+    def convert(row) -> bytes:
+        parts = [field_count]
+        for position, converter in columns:
+            value = row[position]
+            if value is None:
+                parts.append(BINARY_NULL)
+                continue
+            data = converter(value)
+            parts.append(pack_length(len(data)))
+            parts.append(data)
+        return b''.join(parts)
+    return convert
@@ -0,0 +1,133 @@
+# Загрузка таблиц через COPY FROM STDIN во временную таблицу
+# с последующим слиянием в content.<table>
+import struct
+import time
+import uuid
+from dataclasses import dataclass, fields
+from datetime import datetime
+from sqlite3 import Cursor
+
+from psycopg2.extensions import connection as _connection
+
+from converters import compile_binary_converter, compile_text_converter
+from metrics import TableMetrics
+
+PG_TYPES = {
+    uuid.UUID: 'uuid',
+    str: 'text',
+    float: 'double precision',
+    datetime: 'timestamp with time zone',
+}
+
+BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+BINARY_TRAILER = struct.pack('!h', -1)
+# Сколько copy_expert читает из источника за один вызов read
+COPY_READ_SIZE = 1 << 20
+
+
+class IteratorFile:
+    """Файлоподобная обёртка над генератором строк для copy_expert.
+    Текущая порция читается по смещению, без копирования остатка,
+    поэтому время чтения не растёт с размером пачки"""
+
+    def __init__(self, chunks, empty):
+        self._chunks = chunks
+        self._empty = empty
+        self._chunk = empty
+        self._offset = 0
+
+    def read(self, size=-1):
+        parts = []
+        while size != 0:
+            if self._offset >= len(self._chunk):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._chunk, self._offset = chunk, 0
+                continue
+            end = len(self._chunk)
+            if size > 0:
+                end = min(end, self._offset + size)
+                size -= end - self._offset
+            parts.append(self._chunk[self._offset:end])
+            self._offset = end
+        return self._empty.join(parts)
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+def text_copy_lines(cursor: Cursor, dclass: dataclass, batch_size: int,
+                    metrics: TableMetrics):
+    convert = compile_text_converter(cursor.description, dclass)
+    while table_data := cursor.fetchmany(batch_size):
+        with metrics.timer('convert'):
+            chunk = ''.join(map(convert, table_data))
+        yield chunk
+
+
+def binary_copy_chunks(cursor: Cursor, dclass: dataclass, batch_size: int,
+                       metrics: TableMetrics):
+    convert = compile_binary_converter(cursor.description, dclass)
+    yield BINARY_HEADER
+    while table_data := cursor.fetchmany(batch_size):
+        with metrics.timer('convert'):
+            chunk = b''.join(map(convert, table_data))
+        yield chunk
+    yield BINARY_TRAILER
+
+
+def copy_table_to_pg(cursor: Cursor,
+                     pg_conn: _connection,
+                     dclass: dataclass,
+                     table: str,
+                     batch_size: int,
+                     schema: str = 'public',
+                     copy_format: str = 'text',
+                     conflict: str = 'ON CONFLICT (id) DO NOTHING',
+                     metrics: TableMetrics = None) -> int:
+    """Потоково заливает выборку из SQLite через COPY во временную таблицу
+    и переносит её в основную одним INSERT ... SELECT с обработкой
+    конфликтов conflict. Возвращает число вставленных строк.
+    Чтение и преобразование идут внутри COPY, поэтому в стадию write
+    попадает только оставшееся время"""
+    if metrics is None:
+        metrics = TableMetrics(table)
+    columns = [field.name for field in fields(dclass)]
+    insert_fields = ', '.join(columns)
+    # Имя с pg_temp не разрешается через search_path, поэтому DROP
+    # не заденет постоянную таблицу с тем же именем
+    staging = f'pg_temp.staging_{table}'
+    staging_fields = ', '.join(f'{field.name} {PG_TYPES[field.type]}'
+                               for field in fields(dclass))
+    if copy_format == 'binary':
+        source = IteratorFile(
+            binary_copy_chunks(cursor, dclass, batch_size, metrics), b''
+        )
+    else:
+        source = IteratorFile(
+            text_copy_lines(cursor, dclass, batch_size, metrics), ''
+        )
+    read_before = metrics.stages['fetch'] + metrics.stages['convert']
+    started = time.perf_counter()
+    pg_cursor = pg_conn.cursor()
+    pg_cursor.execute(f'DROP TABLE IF EXISTS {staging};')
+    pg_cursor.execute(
+        f'CREATE TEMP TABLE {staging} ({staging_fields}) ON COMMIT DROP;'
+    )
+    pg_cursor.copy_expert(
+        f'COPY {staging} ({insert_fields}) FROM STDIN '
+        f'WITH (FORMAT {copy_format});',
+        source, size=COPY_READ_SIZE
+    )
+    pg_cursor.execute(f"""
+        INSERT INTO {schema}.{table} ({insert_fields})
+            SELECT {insert_fields} FROM {staging}
+            {conflict};
+    """)
+    inserted = pg_cursor.rowcount
+    pg_cursor.execute(f'DROP TABLE {staging};')
+    read_time = metrics.stages['fetch'] + metrics.stages['convert'] \
+        - read_before
+    metrics.stages['write'] += time.perf_counter() - started - read_time
+    return inserted
@@ -0,0 +1,181 @@
+# Первичная загрузка в пустые таблицы без поддержки вторичных индексов.
+# Перед загрузкой определения неуникальных индексов схемы content
+# сохраняются и удаляются, после загрузки восстанавливаются параллельно
+# и таблицы анализируются. Первичные ключи, ограничения уникальности,
+# уникальные индексы и внешние ключи остаются: дубликаты и ссылки
+# на несуществующие записи уходят в карантин, как при обычной загрузке,
+# а не всплывают ошибкой восстановления в конце
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2.extensions import connection as _connection
+
+from load_data import conn_context_pg
+from settings import table_is_dataclass
+
+DEFERRED_TABLE = 'public.loader_deferred_ddl'
+SCHEMA = 'content'
+# Расхождение оценки числа строк после ANALYZE с фактическим
+RELTUPLES_TOLERANCE = 0.1
+
+DEFERRABLE_QUERY = """
+    SELECT 'constraint_' || con.contype, c.relname, con.conname,
+           pg_get_constraintdef(con.oid)
+        FROM pg_constraint con
+        JOIN pg_class c ON c.oid = con.conrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %(schema)s AND c.relname = ANY(%(tables)s)
+            AND con.contype IN ('u', 'f')
+    UNION ALL
+    SELECT 'index', c.relname, i.relname, pg_get_indexdef(i.oid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class c ON c.oid = x.indrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %(schema)s AND c.relname = ANY(%(tables)s)
+            AND NOT x.indisprimary
+            AND NOT EXISTS (
+                SELECT 1 FROM pg_constraint con
+                WHERE con.conindid = x.indexrelid
+                    AND con.conrelid = x.indrelid
+                    AND con.contype IN ('p', 'u', 'x')
+            )
+"""
+
+# Неуникальные индексы, которые можно отложить на время загрузки
+SECONDARY_INDEX_QUERY = """
+    SELECT 'index', c.relname, i.relname, pg_get_indexdef(i.oid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class c ON c.oid = x.indrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %(schema)s AND c.relname = ANY(%(tables)s)
+            AND NOT x.indisprimary AND NOT x.indisunique
+            AND NOT EXISTS (
+                SELECT 1 FROM pg_constraint con
+                WHERE con.conindid = x.indexrelid
+            )
+"""
+
+
+def ensure_target_empty(pg_conn: _connection):
+    cursor = pg_conn.cursor()
+    not_empty = []
+    for table in table_is_dataclass:
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {SCHEMA}.{table});')
+        if cursor.fetchone()[0]:
+            not_empty.append(table)
+    if not_empty:
+        raise RuntimeError(
+            f'Fast initial load needs empty tables, not empty: '
+            f'{", ".join(not_empty)}'
+        )
+
+
+def _drop_sql(kind: str, table: str, name: str) -> str:
+    if kind == 'index':
+        return f'DROP INDEX {SCHEMA}."{name}";'
+    return f'ALTER TABLE {SCHEMA}.{table} DROP CONSTRAINT "{name}";'
+
+
+def create_sql(kind: str, table: str, name: str, definition: str,
+               schema: str = SCHEMA) -> str:
+    if kind == 'index':
+        return definition + ';'
+    return (f'ALTER TABLE {schema}.{table} '
+            f'ADD CONSTRAINT "{name}" {definition};')
+
+
+def defer_indexes(pg_conn: _connection):
+    """Сохраняет определения неуникальных вторичных индексов
+    в public.loader_deferred_ddl и удаляет их одной транзакцией"""
+    cursor = pg_conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DEFERRED_TABLE} (
+            name text PRIMARY KEY,
+            table_name text NOT NULL,
+            kind text NOT NULL,
+            definition text NOT NULL
+        );
+    """)
+    cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {DEFERRED_TABLE});')
+    if cursor.fetchone()[0]:
+        raise RuntimeError(
+            'Indexes from a previous fast load are not restored yet, '
+            'run load_data.py --restore-indexes first'
+        )
+    cursor.execute(SECONDARY_INDEX_QUERY,
+                   {'schema': SCHEMA, 'tables': list(table_is_dataclass)})
+    for kind, table, name, definition in cursor.fetchall():
+        cursor.execute(f"""
+            INSERT INTO {DEFERRED_TABLE} (name, table_name, kind, definition)
+                VALUES (%s, %s, %s, %s);
+        """, (name, table, kind, definition))
+        cursor.execute(_drop_sql(kind, table, name))
+        logging.info('deferred %s %s on %s', kind, name, table)
+    pg_conn.commit()
+
+
+def _run_ddl(dsl: dict, name: str, sql: str):
+    with conn_context_pg(dsl) as pg_conn:
+        cursor = pg_conn.cursor()
+        cursor.execute(sql)
+        cursor.execute(f'DELETE FROM {DEFERRED_TABLE} WHERE name = %s;',
+                       (name,))
+        pg_conn.commit()
+    logging.info('restored %s', name)
+
+
+def analyze_table(dsl: dict, table: str, schema: str = SCHEMA):
+    """ANALYZE с проверкой, что оценка числа строк попала в статистику"""
+    with conn_context_pg(dsl) as pg_conn:
+        pg_conn.autocommit = True
+        cursor = pg_conn.cursor()
+        cursor.execute(f'ANALYZE {schema}.{table};')
+        cursor.execute(f"""
+            SELECT c.reltuples, (SELECT count(*) FROM {schema}.{table})
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = %s AND c.relname = %s;
+        """, (schema, table))
+        estimated, actual = cursor.fetchone()
+    tolerance = actual * RELTUPLES_TOLERANCE
+    if estimated < 0 or abs(estimated - actual) > tolerance:
+        raise RuntimeError(
+            f'ANALYZE of {table} is not reflected in statistics: '
+            f'estimated {estimated}, actual {actual} rows'
+        )
+    logging.info('analyzed %s: %d rows', table, actual)
+
+
+def restore_indexes(dsl: dict, jobs: int):
+    """Восстанавливает отложенные индексы параллельно отдельными
+    соединениями, затем выполняет и проверяет ANALYZE. Ограничения
+    из loader_deferred_ddl прежних версий загрузчика тоже
+    восстанавливаются"""
+    with conn_context_pg(dsl) as pg_conn:
+        cursor = pg_conn.cursor()
+        cursor.execute('SELECT to_regclass(%s);', (DEFERRED_TABLE,))
+        if cursor.fetchone()[0] is None:
+            deferred = []
+        else:
+            cursor.execute(f"""
+                SELECT kind, table_name, name, definition
+                    FROM {DEFERRED_TABLE};
+            """)
+            deferred = cursor.fetchall()
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        # Внешние ключи ссылаются на уникальные индексы и проверяют
+        # всю таблицу, поэтому создаются последними
+        for kinds in (('constraint_u', 'index'), ('constraint_f',)):
+            futures = [
+                executor.submit(_run_ddl, dsl, name,
+                                create_sql(kind, table, name, definition))
+                for kind, table, name, definition in deferred
+                if kind in kinds
+            ]
+            for future in futures:
+                future.result()
+        for future in [executor.submit(analyze_table, dsl, table)
+                       for table in table_is_dataclass]:
+            future.result()
@@ -4,14 +4,37 @@ import os
 import psycopg2
 from psycopg2.extensions import connection as _connection
 from psycopg2.extras import DictCursor
-from settings import dsl, table_is_dataclass
-from query_for_sqlite import query_for_sqlite
-from dataclasses import asdict, dataclass, fields
+from settings import (batch_size, dsl, sqlite_cache_size, sqlite_mmap_size,
+                      table_is_dataclass)
+from dataclasses import dataclass, fields
+from urllib.parse import quote
+from converters import (compile_tuple_converter, compile_validator,
+                        parse_timestamp)
+from sources import FILE_SOURCES, SqliteSource, as_source, watermark_field
+from metrics import LoadMetrics, TableMetrics
+from quarantine import (DeadLetterFile, DeadLetterTable, reject_invalid,
+                        write_batch)
+from copy_loader import copy_table_to_pg
+from checkpoint import (Watermark, checkpoint_key, ensure_checkpoint_table,
+                        read_checkpoint, read_watermark, save_checkpoint,
+                        save_watermark)
+import argparse
 import logging
+import time
 
 @contextmanager
-def conn_context_sqlite(db_path: str):
-    conn = sqlite3.connect(db_path)
+def conn_context_sqlite(db_path: str, immutable: bool = False):
+    """При immutable файл открывается только для чтения без блокировок
+    и журнала, читается через отображение в память и большой кеш страниц.
+    Файл при этом не должен меняться, иначе чтение вернёт мусор"""
+    if immutable:
+        conn = sqlite3.connect(f'file:{quote(db_path)}?mode=ro&immutable=1',
+                               uri=True)
+        conn.execute(f'PRAGMA mmap_size = {sqlite_mmap_size};')
+        # Отрицательный cache_size задаётся в КиБ, а не в страницах
+        conn.execute(f'PRAGMA cache_size = -{sqlite_cache_size // 1024};')
+    else:
+        conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
     yield conn
     conn.close()
@@ -24,52 +47,372 @@ def conn_context_pg(dsl: dict):
     conn.close()
 
 
-def save_dataclass_to_pg(pg_conn: _connection,
-                         dclass: dataclass,
-                         table: str,
-                         schema: str = 'public'):
-    cursor = pg_conn.cursor()
-    dataclass_fields = [field.name for field in fields(dclass)]
-    values_fields = ', '.join(f'%({field})s' for field in dataclass_fields)
-    insert_fields = ', '.join(dataclass_fields)
-    sql = f"""
+@contextmanager
+def source_context(kind: str, path: str, batch_size: int,
+                   immutable: bool = False):
+    """Источник строк: база SQLite или каталог выгрузок CSV/Parquet"""
+    if kind == 'sqlite':
+        with conn_context_sqlite(path, immutable) as conn:
+            yield SqliteSource(conn)
+    else:
+        yield FILE_SOURCES[kind](path, batch_size)
+
+
+def build_conflict_clause(dclass: dataclass, update: bool = False) -> str:
+    """Пропуск существующих записей или их обновление при синхронизации"""
+    if not update:
+        return 'ON CONFLICT (id) DO NOTHING'
+    update_fields = ', '.join(f'{field.name} = EXCLUDED.{field.name}'
+                              for field in fields(dclass)
+                              if field.name != 'id')
+    return f'ON CONFLICT (id) DO UPDATE SET {update_fields}'
+
+
+def build_insert_sql(dclass: dataclass,
+                     table: str,
+                     schema: str = 'public',
+                     conflict: str = 'ON CONFLICT (id) DO NOTHING') -> str:
+    """SQL для многострочной вставки, строится один раз на таблицу"""
+    insert_fields = ', '.join(field.name for field in fields(dclass))
+    return f"""
         INSERT INTO {schema}.{table} ({insert_fields})
-            VALUES ({values_fields})
-            ON CONFLICT (id) DO NOTHING;
+            VALUES %s
+            {conflict};
     """
-    cursor.execute(sql, asdict(dclass))
 
 
-def load_from_sqlite(connection: sqlite3.Connection,
-                     pg_conn: _connection,
-                     batch_size: int):
-    """Основной метод загрузки данных из SQLite в Postgres"""
-    for table, dclass in table_is_dataclass.items():
-        try:
-            cursor = connection.execute(
-                query_for_sqlite[table]
-            )
-        except Exception as e:
-            logging.error(e)
-            continue
-        while table_data := cursor.fetchmany(batch_size):
-            for row in table_data:
-                dobject = dclass(**row)
-                try:
-                    save_dataclass_to_pg(pg_conn, dobject, table, 'content')
-                except Exception as e:
-                    logging.error(e)
+class TrackingCursor:
+    """Обёртка над курсором SQLite, запоминающая последний прочитанный rowid
+    и наибольшее время изменения строк и учитывающая время чтения
+    и число прочитанных строк"""
 
+    def __init__(self, cursor: sqlite3.Cursor, metrics: TableMetrics,
+                 watermark: Watermark, watermark_name: str):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._watermark = watermark
+        self.description = cursor.description
+        names = [column[0] for column in self.description]
+        self._rowid = names.index('rowid')
+        self._modified = names.index(watermark_name)
+        self.last_rowid = None
 
-if __name__ == '__main__':
-    logging.basicConfig(format='%(process)d-%(levelname)s-%(message)s')
-    with conn_context_sqlite(os.environ.get('PATH_TO_SQLITE')) as sqlite_conn,\
-            conn_context_pg(dsl) as pg_conn:
-        sqlite_conn.row_factory = sqlite3.Row
-        pg_conn.autocommit = False
+    def fetchmany(self, size: int) -> list:
+        with self._metrics.timer('fetch'):
+            rows = self._cursor.fetchmany(size)
+            self._watermark.update(max(
+                (modified for row in rows
+                 if (modified := row[self._modified]) is not None),
+                key=parse_timestamp, default=None
+            ))
+        self._metrics.count('read', len(rows))
+        if rows:
+            self.last_rowid = rows[-1][self._rowid]
+        return rows
+
+
+def load_table(connection: sqlite3.Connection,
+               pg_conn: _connection,
+               table: str,
+               batch_size: int,
+               mode: str = 'insert',
+               copy_format: str = 'text',
+               rowid_range: tuple = None,
+               resume: bool = False,
+               since: str = None,
+               validate: bool = False,
+               metrics: TableMetrics = None,
+               dead_letter_file: str = None,
+               schema: str = 'content',
+               watermark: Watermark = None) -> bool:
+    """Переносит одну таблицу (или диапазон rowid в ней)
+    из SQLite или другого источника из sources.py в схему schema.
+    Каждая пачка фиксируется вместе с контрольной точкой, при resume
+    загрузка продолжается с последней зафиксированной точки.
+    Если задан since, переносятся только строки, изменённые позже него,
+    и они обновляют уже существующие записи.
+    Строки читаются кортежами и преобразуются без создания датаклассов,
+    при validate строки с неразбираемыми uuid, временем или числами
+    уходят в карантин, не доходя до Postgres.
+    Время стадий и счётчики строк накапливаются в metrics,
+    наибольшее время изменения прочитанных строк — в watermark.
+    Строки, которые Postgres не принял, уходят в карантин: в таблицу
+    public.loader_dead_letter или в файл dead_letter_file.
+    Если не удалась загрузка через COPY, таблица повторно переносится
+    пачками INSERT, чтобы изолировать ошибочные строки.
+    Ошибка, не связанная с содержимым строк, останавливает таблицу
+    на последней зафиксированной пачке.
+    Возвращает False, если часть строк перенести не удалось"""
+    dclass = table_is_dataclass[table]
+    if metrics is None:
+        metrics = TableMetrics(table)
+    if watermark is None:
+        watermark = Watermark()
+    key = checkpoint_key(table, rowid_range)
+    delta = since is not None
+    after_rowid = None
+    if resume and not delta:
+        after_rowid = read_checkpoint(pg_conn, key)
+    try:
+        cursor = TrackingCursor(as_source(connection).read(
+            table, rowid_range, after_rowid, since
+        ), metrics, watermark, watermark_field(table))
+    except Exception as e:
+        logging.error(e)
+        return False
+    conflict = build_conflict_clause(dclass, update=delta)
+    if mode == 'copy':
+        read_before = metrics.counters['read']
         try:
-            load_from_sqlite(sqlite_conn, pg_conn, 5)
+            written = copy_table_to_pg(cursor, pg_conn, dclass, table,
+                                       batch_size, schema, copy_format,
+                                       conflict, metrics)
+            if not delta and cursor.last_rowid is not None:
+                save_checkpoint(pg_conn, key, cursor.last_rowid)
+            with metrics.timer('commit'):
+                pg_conn.commit()
         except Exception as e:
-            logging.error(e)
-        finally:
+            logging.error('%s: COPY failed, retrying with INSERT: %s',
+                          table, e)
+            pg_conn.rollback()
+            # Строки прочитаны заново при повторе, не учитываем их дважды
+            metrics.count('read', read_before - metrics.counters['read'])
+            return load_table(connection, pg_conn, table, batch_size,
+                              'insert', rowid_range=rowid_range,
+                              resume=resume, since=since,
+                              validate=validate, metrics=metrics,
+                              dead_letter_file=dead_letter_file,
+                              schema=schema, watermark=watermark)
+        metrics.count('written', written)
+        metrics.count('skipped',
+                      metrics.counters['read'] - read_before - written)
+        return True
+    ok = True
+    columns = [field.name for field in fields(dclass)]
+    if dead_letter_file:
+        dead_letter = DeadLetterFile(dead_letter_file)
+    else:
+        dead_letter = DeadLetterTable(pg_conn)
+    sql = build_insert_sql(dclass, table, schema, conflict)
+    convert = compile_tuple_converter(cursor.description, dclass)
+    check = compile_validator(dclass) if validate else None
+    while table_data := cursor.fetchmany(batch_size):
+        try:
+            rejected = 0
+            with metrics.timer('convert'):
+                rows = list(map(convert, table_data))
+                if check is not None:
+                    rows, rejected = reject_invalid(rows, check, table,
+                                                    columns, dead_letter)
+            with metrics.timer('write'):
+                written, failed = write_batch(pg_conn, sql, rows, table,
+                                              columns, dead_letter)
+                failed += rejected
+                if not delta:
+                    save_checkpoint(pg_conn, key, cursor.last_rowid)
+            with metrics.timer('commit'):
+                pg_conn.commit()
+        except Exception as e:
+            # Контрольная точка остаётся на последней зафиксированной
+            # пачке, чтобы --resume повторил эту пачку, а не пропустил её
+            logging.error('%s: batch failed, table stopped: %s', table, e)
+            pg_conn.rollback()
+            metrics.count('failed', len(table_data))
+            return False
+        if failed:
+            logging.warning('%s: %d rows moved to dead letter', table, failed)
+            ok = False
+        metrics.count('written', written)
+        metrics.count('failed', failed)
+        metrics.count('skipped', len(table_data) - written - failed)
+    return ok
+
+
+def resolve_since(pg_conn: _connection, table: str,
+                  since: str = None, delta: bool = False):
+    """Явно заданная граница или водяной знак прошлой синхронизации"""
+    if since is not None:
+        return since
+    if delta:
+        return read_watermark(pg_conn, table)
+    return None
+
+
+def load_from_sqlite(connection: sqlite3.Connection,
+                     pg_conn: _connection,
+                     batch_size: int,
+                     mode: str = 'insert',
+                     copy_format: str = 'text',
+                     resume: bool = False,
+                     since: str = None,
+                     delta: bool = False,
+                     validate: bool = False,
+                     metrics: LoadMetrics = None,
+                     dead_letter_file: str = None,
+                     schema: str = 'content') -> bool:
+    """Основной метод загрузки данных из SQLite в Postgres.
+    Вместо соединения SQLite можно передать источник из sources.py.
+    Возвращает False, если хотя бы одну таблицу не удалось перенести
+    целиком"""
+    if metrics is None:
+        metrics = LoadMetrics()
+    loaded = True
+    for table in table_is_dataclass:
+        started = time.monotonic()
+        watermark = Watermark()
+        ok = load_table(connection, pg_conn, table, batch_size,
+                        mode, copy_format, resume=resume,
+                        since=resolve_since(pg_conn, table, since, delta),
+                        validate=validate, metrics=metrics.table(table),
+                        dead_letter_file=dead_letter_file, schema=schema,
+                        watermark=watermark)
+        if ok and watermark.value is not None:
+            save_watermark(pg_conn, table, watermark.value)
             pg_conn.commit()
+        loaded = loaded and ok
+        metrics.table(table).elapsed = time.monotonic() - started
+        logging.info('%s loaded in %.2f s', table,
+                     metrics.table(table).elapsed)
+    return loaded
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Перенос данных из SQLite в Postgres'
+    )
+    parser.add_argument('--source', choices=('sqlite', *FILE_SOURCES),
+                        default='sqlite',
+                        help='база SQLite или каталог выгрузок CSV/Parquet')
+    parser.add_argument('--source-path',
+                        default=os.environ.get('PATH_TO_SQLITE'),
+                        help='файл SQLite или каталог с файлами <table>.csv '
+                             'или <table>.parquet')
+    parser.add_argument('--immutable-source', action='store_true',
+                        help='читать файл SQLite как неизменяемый, '
+                             'через mmap и большой кеш страниц')
+    parser.add_argument('--mode', choices=('insert', 'copy'),
+                        default='insert')
+    parser.add_argument('--copy-format', choices=('text', 'binary'),
+                        default='text')
+    parser.add_argument('--batch-size', type=int, default=batch_size)
+    parser.add_argument('--jobs', type=int,
+                        help='число процессов для параллельной загрузки, '
+                             'по умолчанию --workers-per-table')
+    parser.add_argument('--workers-per-table', type=int, default=1,
+                        help='на сколько диапазонов rowid делить таблицу')
+    parser.add_argument('--resume', action='store_true',
+                        help='продолжить с сохранённых контрольных точек')
+    sync = parser.add_mutually_exclusive_group()
+    sync.add_argument('--since',
+                      help='перенести только строки, изменённые позже')
+    sync.add_argument('--delta', action='store_true',
+                      help='перенести строки, изменённые после '
+                           'прошлой синхронизации')
+    parser.add_argument('--validate', action='store_true',
+                        help='проверять значения строк по типам полей '
+                             'датаклассов из models.py, ошибочные строки '
+                             'отправлять в карантин')
+    parser.add_argument('--dead-letter-file',
+                        help='файл JSON Lines для строк, которые не удалось '
+                             'записать, вместо public.loader_dead_letter')
+    parser.add_argument('--fast-initial-load', action='store_true',
+                        help='загрузка в пустые таблицы с удалением '
+                             'вторичных индексов и их последующим '
+                             'параллельным восстановлением')
+    parser.add_argument('--restore-indexes', action='store_true',
+                        help='только восстановить индексы, отложенные '
+                             'прерванной быстрой загрузкой')
+    parser.add_argument('--staging-swap', action='store_true',
+                        help='полная перезагрузка через UNLOGGED-таблицы '
+                             'схемы content_staging с атомарной подменой '
+                             'схемы content')
+    parser.add_argument('--metrics-json',
+                        help='файл для метрик загрузки в JSON')
+    parser.add_argument('--metrics-prom',
+                        help='файл для метрик в textfile-формате Prometheus')
+    args = parser.parse_args()
+    if args.jobs is None:
+        # Иначе все диапазоны таблицы грузились бы по очереди в одном процессе
+        args.jobs = args.workers_per_table
+    if args.staging_swap and (args.resume or args.since or args.delta
+                              or args.fast_initial_load):
+        parser.error('--staging-swap always reloads all tables from scratch')
+    if args.source != 'sqlite' and (args.jobs > 1
+                                    or args.workers_per_table > 1):
+        parser.error('parallel load is supported only for --source=sqlite')
+    if args.validate and args.mode != 'insert':
+        parser.error('--validate applies only to --mode=insert')
+    if args.immutable_source and args.source != 'sqlite':
+        parser.error('--immutable-source applies only to --source=sqlite')
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    logging.basicConfig(format='%(process)d-%(levelname)s-%(message)s',
+                        level=logging.INFO)
+    if args.restore_indexes:
+        from fast_load import restore_indexes
+        restore_indexes(dsl, args.jobs)
+        raise SystemExit
+    with conn_context_pg(dsl) as pg_conn:
+        ensure_checkpoint_table(pg_conn)
+        DeadLetterTable.ensure(pg_conn)
+        if args.fast_initial_load:
+            from fast_load import (defer_indexes, ensure_target_empty,
+                                   restore_indexes)
+            ensure_target_empty(pg_conn)
+            defer_indexes(pg_conn)
+    schema = 'content'
+    if args.staging_swap:
+        from staging_swap import STAGING_SCHEMA, prepare_staging, swap_staging
+        with conn_context_pg(dsl) as pg_conn:
+            prepare_staging(pg_conn)
+        schema = STAGING_SCHEMA
+    load_metrics = LoadMetrics()
+    if args.jobs > 1 or args.workers_per_table > 1:
+        from scheduler import load_parallel
+        loaded = load_parallel(args.source_path, dsl, args.jobs,
+                               args.workers_per_table,
+                               immutable=args.immutable_source,
+                               batch_size=args.batch_size,
+                               mode=args.mode,
+                               copy_format=args.copy_format,
+                               resume=args.resume, since=args.since,
+                               delta=args.delta, validate=args.validate,
+                               metrics=load_metrics,
+                               dead_letter_file=args.dead_letter_file,
+                               schema=schema)
+    else:
+        with source_context(args.source, args.source_path,
+                            args.batch_size, args.immutable_source) as source,\
+                conn_context_pg(dsl) as pg_conn:
+            pg_conn.autocommit = False
+            try:
+                loaded = load_from_sqlite(
+                    source, pg_conn, args.batch_size, args.mode,
+                    args.copy_format, args.resume, args.since, args.delta,
+                    args.validate, load_metrics, args.dead_letter_file,
+                    schema
+                )
+            except Exception as e:
+                logging.error(e)
+                loaded = False
+            finally:
+                pg_conn.commit()
+    load_metrics.log()
+    if args.metrics_json:
+        load_metrics.write_json(args.metrics_json)
+    if args.metrics_prom:
+        load_metrics.write_prometheus(args.metrics_prom)
+    if args.fast_initial_load:
+        restore_indexes(dsl, args.jobs)
+    if args.staging_swap:
+        # Неполные данные не должны заменить рабочую схему
+        if loaded:
+            swap_staging(dsl, args.jobs)
+        else:
+            logging.error('load failed, %s is not swapped in, '
+                          'content is left as is', schema)
+    if not loaded:
+        raise SystemExit(1)
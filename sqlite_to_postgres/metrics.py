@@ -0,0 +1,108 @@
+# Метрики загрузки: время по стадиям и счётчики строк по таблицам
+# с выгрузкой в JSON или в textfile-формат Prometheus
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+STAGES = ('fetch', 'convert', 'write', 'commit')
+COUNTERS = ('read', 'written', 'skipped', 'failed')
+
+
+class TableMetrics:
+    """Метрики одной таблицы. Объект передаётся между процессами,
+    поэтому хранит только простые значения"""
+
+    def __init__(self, table: str):
+        self.table = table
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.elapsed = 0.0
+
+    @contextmanager
+    def timer(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage] += time.perf_counter() - started
+
+    def count(self, counter: str, value: int = 1):
+        self.counters[counter] += value
+
+    def merge(self, other: 'TableMetrics'):
+        for stage, seconds in other.stages.items():
+            self.stages[stage] += seconds
+        for counter, value in other.counters.items():
+            self.counters[counter] += value
+
+    @property
+    def rows_per_second(self) -> float:
+        if not self.elapsed:
+            return 0.0
+        return self.counters['written'] / self.elapsed
+
+    def as_dict(self) -> dict:
+        return {
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'stages': {stage: round(seconds, 3)
+                       for stage, seconds in self.stages.items()},
+            'rows': dict(self.counters),
+        }
+
+
+class LoadMetrics:
+    """Метрики всей загрузки, по таблицам"""
+
+    def __init__(self):
+        self.tables = {}
+
+    def table(self, table: str) -> TableMetrics:
+        if table not in self.tables:
+            self.tables[table] = TableMetrics(table)
+        return self.tables[table]
+
+    def log(self):
+        for metrics in self.tables.values():
+            logging.info(
+                '%s: read %d, written %d, skipped %d, failed %d rows, '
+                '%.1f rows/s, stages %s', metrics.table,
+                *(metrics.counters[counter] for counter in COUNTERS),
+                metrics.rows_per_second, metrics.as_dict()['stages']
+            )
+
+    def write_json(self, path: str):
+        with open(path, 'w') as output:
+            json.dump({table: metrics.as_dict()
+                       for table, metrics in self.tables.items()},
+                      output, indent=2)
+
+    def write_prometheus(self, path: str):
+        """Файл для textfile collector node_exporter. Строки каждой
+        метрики идут одной группой сразу после её # TYPE"""
+        tables = self.tables.items()
+        lines = ['# TYPE loader_rows_total counter']
+        lines.extend(f'loader_rows_total{{table="{table}",'
+                     f'result="{counter}"}} {value}'
+                     for table, metrics in tables
+                     for counter, value in metrics.counters.items())
+        lines.append('# TYPE loader_stage_seconds_total counter')
+        lines.extend(f'loader_stage_seconds_total{{table="{table}",'
+                     f'stage="{stage}"}} {seconds:.6f}'
+                     for table, metrics in tables
+                     for stage, seconds in metrics.stages.items())
+        lines.append('# TYPE loader_table_seconds gauge')
+        lines.extend(f'loader_table_seconds{{table="{table}"}} '
+                     f'{metrics.elapsed:.6f}'
+                     for table, metrics in tables)
+        lines.append('# TYPE loader_rows_per_second gauge')
+        lines.extend(f'loader_rows_per_second{{table="{table}"}} '
+                     f'{metrics.rows_per_second:.3f}'
+                     for table, metrics in tables)
+        # Пишем во временный файл и переименовываем, чтобы коллектор
+        # не прочитал файл наполовину
+        with open(path + '.tmp', 'w') as output:
+            output.write('\n'.join(lines) + '\n')
+        os.replace(path + '.tmp', path)
@@ -1,10 +1,12 @@
 import uuid
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import datetime
 
 
 @dataclass
 class Filmwork:
+    __slots__ = ('id', 'title', 'description', 'creation_date', 'rating',
+                 'type', 'certificate', 'file_path', 'created', 'modified')
     id: uuid.UUID
     title: str
     description: str
@@ -19,6 +21,7 @@ class Filmwork:
 
 @dataclass
 class Genre:
+    __slots__ = ('id', 'name', 'description', 'created', 'modified')
     id: uuid.UUID
     name: str
     description: str
@@ -28,6 +31,7 @@ class Genre:
 
 @dataclass
 class Person:
+    __slots__ = ('id', 'full_name', 'created', 'modified')
     id: uuid.UUID
     full_name: str
     created: datetime
@@ -36,6 +40,7 @@ class Person:
 
 @dataclass
 class GenreFilmwork:
+    __slots__ = ('id', 'genre_id', 'film_work_id', 'created')
     id: uuid.UUID
     genre_id: uuid.UUID
     film_work_id: uuid.UUID
@@ -44,8 +49,33 @@ class GenreFilmwork:
 
 @dataclass
 class PersonFilmwork:
+    __slots__ = ('id', 'person_id', 'film_work_id', 'role', 'created')
     id: uuid.UUID
     person_id: uuid.UUID
     film_work_id: uuid.UUID
     role: str
     created: datetime
+
+
+class RowBatch:
+    """Пачка строк одной таблицы, хранящаяся по колонкам.
+    Занимает меньше памяти, чем список кортежей или объектов,
+    и отдаёт строки кортежами в порядке полей датакласса"""
+    __slots__ = ('dclass', 'columns')
+
+    def __init__(self, dclass: dataclass, rows=()):
+        self.dclass = dclass
+        self.columns = tuple([] for _ in fields(dclass))
+        self.extend(rows)
+
+    def extend(self, rows):
+        appends = [column.append for column in self.columns]
+        for row in rows:
+            for append, value in zip(appends, row):
+                append(value)
+
+    def __len__(self) -> int:
+        return len(self.columns[0])
+
+    def rows(self):
+        return zip(*self.columns)
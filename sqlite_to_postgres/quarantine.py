@@ -0,0 +1,120 @@
+# Изоляция ошибочных строк: пачка, которую Postgres не принял, делится
+# пополам под точками сохранения, пока ошибка не сведётся к отдельным
+# строкам. Они уходят в карантин вместе с текстом ошибки,
+# остальные строки пачки записываются
+import json
+
+import psycopg2
+from psycopg2.extensions import connection as _connection
+from psycopg2.extras import execute_values
+
+# Ошибки, вызванные содержимым строк. Остальные (потеря соединения и т.п.)
+# делением пачки не лечатся
+ROW_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError)
+DEAD_LETTER_TABLE = 'public.loader_dead_letter'
+
+
+class DeadLetterTable:
+    """Карантин в Postgres: строки фиксируются в одной транзакции с пачкой"""
+
+    def __init__(self, pg_conn: _connection):
+        self.pg_conn = pg_conn
+
+    @staticmethod
+    def ensure(pg_conn: _connection):
+        cursor = pg_conn.cursor()
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {DEAD_LETTER_TABLE} (
+                id bigserial PRIMARY KEY,
+                table_name text NOT NULL,
+                row jsonb NOT NULL,
+                error text NOT NULL,
+                created timestamp with time zone NOT NULL DEFAULT now()
+            );
+        """)
+        pg_conn.commit()
+
+    def add(self, table: str, row: dict, error: str):
+        cursor = self.pg_conn.cursor()
+        cursor.execute(f"""
+            INSERT INTO {DEAD_LETTER_TABLE} (table_name, row, error)
+                VALUES (%s, %s, %s);
+        """, (table, json.dumps(row, default=str), error))
+
+
+class DeadLetterFile:
+    """Карантин в файле JSON Lines, дописывается из нескольких процессов"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def add(self, table: str, row: dict, error: str):
+        with open(self.path, 'a') as output:
+            output.write(json.dumps({'table': table, 'row': row,
+                                     'error': error}, default=str) + '\n')
+
+
+def reject_invalid(rows: list, validate, table: str, columns: list,
+                   dead_letter) -> tuple:
+    """Отправляет в карантин строки, не прошедшие validate.
+    Возвращает оставшиеся строки и число строк в карантине"""
+    valid = []
+    for row in rows:
+        error = validate(row)
+        if error is None:
+            valid.append(row)
+        else:
+            dead_letter.add(table, dict(zip(columns, row)), error)
+    return valid, len(rows) - len(valid)
+
+
+def _insert_with_savepoint(cursor, sql: str, rows: list):
+    cursor.execute('SAVEPOINT loader_batch;')
+    try:
+        execute_values(cursor, sql, rows, page_size=len(rows))
+    except ROW_ERRORS:
+        cursor.execute('ROLLBACK TO SAVEPOINT loader_batch;')
+        raise
+    # После RELEASE rowcount у курсора становится -1
+    written = cursor.rowcount
+    cursor.execute('RELEASE SAVEPOINT loader_batch;')
+    return written
+
+
+def bisect_insert(pg_conn: _connection, sql: str, rows: list, table: str,
+                  columns: list, dead_letter) -> tuple:
+    """Записывает rows, деля их пополам при ошибке.
+    Возвращает число записанных строк и число строк в карантине"""
+    cursor = pg_conn.cursor()
+    written = failed = 0
+    parts = [rows]
+    while parts:
+        part = parts.pop()
+        try:
+            written += _insert_with_savepoint(cursor, sql, part)
+        except ROW_ERRORS as e:
+            if len(part) == 1:
+                dead_letter.add(table, dict(zip(columns, part[0])),
+                                str(e).strip())
+                failed += 1
+                continue
+            middle = len(part) // 2
+            parts.append(part[middle:])
+            parts.append(part[:middle])
+    return written, failed
+
+
+def write_batch(pg_conn: _connection, sql: str, rows: list, table: str,
+                columns: list, dead_letter) -> tuple:
+    """Пишет пачку одним запросом под точкой сохранения. При ошибке
+    откатывается только пачка, а не вся транзакция со строками,
+    уже отправленными в карантин проверкой, и пачка повторяется
+    делением пополам.
+    Возвращает число записанных строк и число строк в карантине"""
+    if not rows:
+        return 0, 0
+    try:
+        return _insert_with_savepoint(pg_conn.cursor(), sql, rows), 0
+    except ROW_ERRORS:
+        pass
+    return bisect_insert(pg_conn, sql, rows, table, columns, dead_letter)
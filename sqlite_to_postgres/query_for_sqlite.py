@@ -2,6 +2,7 @@
 
 query_for_sqlite = {
     'film_work': """select
+                    rowid,
                     id,
                     title,
                     description,
@@ -14,12 +15,14 @@ query_for_sqlite = {
                     updated_at modified
                 from film_work fw""",
     'person': """select
+                rowid,
                 id,
                 full_name,
                 created_at created,
                 updated_at modified
                 from person""",
     'genre': """select
+                rowid,
                 id,
                 name,
                 description,
@@ -27,12 +30,14 @@ query_for_sqlite = {
                 updated_at modified
                 from genre""",
     'genre_film_work': """select
+                rowid,
                 id,
                 genre_id,
                 film_work_id,
                 created_at created
                 from genre_film_work""",
     'person_film_work': """select
+                rowid,
                 id,
                 person_id,
                 film_work_id,
@@ -40,3 +45,23 @@ query_for_sqlite = {
                 created_at created
                 from person_film_work"""
 }
+
+# Колонка SQLite, по которой отбираются изменённые строки.
+# У связующих таблиц нет updated_at, строки в них только добавляются
+watermark_column = {
+    'film_work': 'updated_at',
+    'person': 'updated_at',
+    'genre': 'updated_at',
+    'genre_film_work': 'created_at',
+    'person_film_work': 'created_at',
+}
+
+
+def build_query(table: str, conditions: tuple = (),
+                order_by: str = 'rowid') -> str:
+    """Запрос к таблице с дополнительными условиями отбора.
+    По умолчанию упорядочен по rowid для сохранения контрольных точек"""
+    query = query_for_sqlite[table]
+    if conditions:
+        query += '\n                where ' + ' and '.join(conditions)
+    return query + f'\n                order by {order_by}'
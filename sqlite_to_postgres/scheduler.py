@@ -0,0 +1,131 @@
+# Параллельная загрузка таблиц в отдельных процессах
+# с учётом зависимостей между ними
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from checkpoint import Watermark, save_watermark
+from load_data import (conn_context_pg, conn_context_sqlite, load_table,
+                       resolve_since)
+from metrics import LoadMetrics, TableMetrics
+from settings import table_dependencies
+
+
+def split_rowid_ranges(sqlite_conn, table: str, parts: int) -> list:
+    """Делит таблицу на parts диапазонов rowid вида (от, до]"""
+    if parts <= 1:
+        return [None]
+    low, high = sqlite_conn.execute(
+        f'select min(rowid), max(rowid) from {table}'
+    ).fetchone()
+    if low is None:
+        return [None]
+    low -= 1
+    step = max((high - low) // parts, 1)
+    bounds = list(range(low, high, step))[:parts] + [high]
+    return list(zip(bounds, bounds[1:]))
+
+
+def prepare_table(sqlite_path: str, dsl: dict, table: str,
+                  workers_per_table: int, since: str, delta: bool,
+                  immutable: bool = False) -> tuple:
+    """Диапазоны rowid и граница отбора таблицы.
+    Соединения закрываются до запуска рабочих процессов,
+    чтобы те не унаследовали их при fork"""
+    with conn_context_sqlite(sqlite_path, immutable) as sqlite_conn,\
+            conn_context_pg(dsl) as pg_conn:
+        ranges = split_rowid_ranges(sqlite_conn, table, workers_per_table)
+        table_since = resolve_since(pg_conn, table, since, delta)
+    return ranges, table_since
+
+
+def load_table_worker(table: str, sqlite_path: str, dsl: dict,
+                      immutable: bool = False, **options) -> tuple:
+    """Загружает таблицу на собственных соединениях,
+    возвращает признак успеха, метрики и водяной знак прочитанных строк"""
+    metrics = TableMetrics(table)
+    watermark = Watermark()
+    with conn_context_sqlite(sqlite_path, immutable) as sqlite_conn,\
+            conn_context_pg(dsl) as pg_conn:
+        pg_conn.autocommit = False
+        try:
+            ok = load_table(sqlite_conn, pg_conn, table, metrics=metrics,
+                            watermark=watermark, **options)
+        finally:
+            pg_conn.commit()
+    return ok, metrics, watermark.value
+
+
+def load_parallel(sqlite_path: str, dsl: dict, jobs: int,
+                  workers_per_table: int = 1, since: str = None,
+                  delta: bool = False, metrics: LoadMetrics = None,
+                  immutable: bool = False, **options) -> bool:
+    """Запускает таблицу, как только загружены все её зависимости.
+    Каждая таблица делится на workers_per_table диапазонов rowid,
+    которые грузятся параллельно.
+    При immutable файл SQLite читается как неизменяемый.
+    Возвращает False, если хотя бы одну таблицу не удалось перенести
+    целиком"""
+    if metrics is None:
+        metrics = LoadMetrics()
+    pending = dict(table_dependencies)
+    done = set()
+    parts_left = {}
+    failed = set()
+    watermarks = {}
+    table_started = {}
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        running = {}
+        while pending or running:
+            ready = [table for table, parents in pending.items()
+                     if done.issuperset(parents)]
+            for table in ready:
+                del pending[table]
+                ranges, table_since = prepare_table(
+                    sqlite_path, dsl, table, workers_per_table, since, delta,
+                    immutable
+                )
+                watermarks[table] = Watermark()
+                parts_left[table] = len(ranges)
+                table_started[table] = time.monotonic()
+                for rowid_range in ranges:
+                    future = executor.submit(load_table_worker, table,
+                                             sqlite_path, dsl, immutable,
+                                             rowid_range=rowid_range,
+                                             since=table_since,
+                                             **options)
+                    running[future] = table
+            if not running:
+                raise RuntimeError(
+                    f'Unresolvable table dependencies: {sorted(pending)}'
+                )
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                table = running.pop(future)
+                try:
+                    ok, part_metrics, part_watermark = future.result()
+                    metrics.table(table).merge(part_metrics)
+                    watermarks[table].update(part_watermark)
+                    if not ok:
+                        failed.add(table)
+                except Exception as e:
+                    logging.error('%s: %s', table, e)
+                    failed.add(table)
+                parts_left[table] -= 1
+                if parts_left[table]:
+                    continue
+                if (table not in failed
+                        and watermarks[table].value is not None):
+                    with conn_context_pg(dsl) as pg_conn:
+                        save_watermark(pg_conn, table,
+                                       watermarks[table].value)
+                        pg_conn.commit()
+                elapsed = time.monotonic() - table_started[table]
+                metrics.table(table).elapsed = elapsed
+                logging.info('%s loaded in %.2f s', table, elapsed)
+                done.add(table)
+    logging.info('all tables loaded in %.2f s', time.monotonic() - started)
+    if failed:
+        logging.error('failed tables: %s', ', '.join(sorted(failed)))
+    return not failed
@@ -11,10 +11,27 @@ dsl = {'dbname': os.environ.get('POSTGRES_DB'),
        'host': os.environ.get('POSTGRES_HOST'),
        'port': os.environ.get('POSTGRES_PORT')}
 
+batch_size = int(os.environ.get('BATCH_SIZE', 1000))
+
+# Чтение неизменяемого файла SQLite (--immutable-source): размер отображения
+# файла в память и кеша страниц в байтах. Отображение ограничено
+# SQLITE_MAX_MMAP_SIZE, с которым собран SQLite (обычно 2 ГБ)
+sqlite_mmap_size = int(os.environ.get('SQLITE_MMAP_SIZE', 2 ** 31))
+sqlite_cache_size = int(os.environ.get('SQLITE_CACHE_SIZE', 2 ** 28))
+
 table_is_dataclass = {
        'film_work': Filmwork,
        'genre': Genre,
        'person': Person,
        'person_film_work': PersonFilmwork,
        'genre_film_work': GenreFilmwork,
-}
\ No newline at end of file
+}
+
+# Таблицы, которые должны быть загружены раньше таблицы-ключа
+table_dependencies = {
+       'film_work': (),
+       'genre': (),
+       'person': (),
+       'person_film_work': ('film_work', 'person'),
+       'genre_film_work': ('film_work', 'genre'),
+}
@@ -0,0 +1,170 @@
+# Источники строк для загрузки: база SQLite и выгрузки CSV и Parquet.
+# Источник отдаёт для таблицы курсороподобный объект с description
+# и fetchmany. Строки содержат rowid и колонки с именами полей датаклассов
+# из models.py, поэтому все источники проходят через одни и те же
+# преобразователи и путь записи в Postgres
+import csv
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+from dataclasses import fields
+from itertools import chain, islice
+from operator import itemgetter
+
+from converters import parse_timestamp
+from query_for_sqlite import build_query, watermark_column
+from settings import table_is_dataclass
+
+# Поле датакласса, соответствующее колонке watermark_column в SQLite
+WATERMARK_FIELDS = {'updated_at': 'modified', 'created_at': 'created'}
+
+
+def _description(names) -> tuple:
+    """description в формате DB-API, нужны только имена колонок"""
+    return tuple((name, None, None, None, None, None, None)
+                 for name in names)
+
+
+def _columns(table: str) -> list:
+    return [field.name for field in fields(table_is_dataclass[table])]
+
+
+def watermark_field(table: str) -> str:
+    return WATERMARK_FIELDS[watermark_column[table]]
+
+
+class SqliteSource:
+    """Таблицы базы SQLite, запросы из query_for_sqlite.py"""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def read(self, table: str, rowid_range: tuple = None,
+             after_rowid: int = None, since: str = None):
+        conditions, params = [], []
+        if rowid_range is not None:
+            conditions.append('rowid > (?) and rowid <= (?)')
+            params.extend(rowid_range)
+        if since is not None:
+            conditions.append(f'{watermark_column[table]} > (?)')
+            params.append(since)
+        if after_rowid is not None:
+            conditions.append('rowid > (?)')
+            params.append(after_rowid)
+        cursor = self.connection.cursor()
+        cursor.row_factory = None
+        return cursor.execute(build_query(table, conditions), params)
+
+
+class RowsCursor:
+    """Курсор над итератором кортежей, первая колонка — rowid"""
+
+    def __init__(self, columns: list, rows):
+        self.description = _description(['rowid', *columns])
+        self._rows = rows
+
+    def fetchmany(self, size: int) -> list:
+        return list(islice(self._rows, size))
+
+
+class FileSource(ABC):
+    """Каталог выгрузок <table>.<extension>. rowid — номер строки
+    в файле начиная с 1, по нему работают контрольные точки и диапазоны"""
+    extension = None
+
+    def __init__(self, directory: str, batch_size: int = 1000):
+        self.directory = directory
+        self.batch_size = batch_size
+
+    def path(self, table: str) -> str:
+        return os.path.join(self.directory, f'{table}.{self.extension}')
+
+    @abstractmethod
+    def batches(self, table: str, columns: list, skip: int):
+        """Пачки строк с номерами, начиная с номера skip + 1.
+        Пачки, целиком лежащие до него, можно не разбирать"""
+
+    def read(self, table: str, rowid_range: tuple = None,
+             after_rowid: int = None, since: str = None) -> RowsCursor:
+        if not os.path.exists(self.path(table)):
+            raise FileNotFoundError(f'No dump for {table}: {self.path(table)}')
+        columns = _columns(table)
+        low, high = rowid_range or (0, None)
+        low = max(low, after_rowid or 0)
+        rows = chain.from_iterable(self.batches(table, columns, low))
+        rows = (row for row in rows if row[0] > low)
+        if high is not None:
+            rows = (row for row in rows if row[0] <= high)
+        if since is not None:
+            position = columns.index(watermark_field(table)) + 1
+            bound = parse_timestamp(since)
+            rows = (row for row in rows if row[position] is not None
+                    and parse_timestamp(row[position]) > bound)
+        return RowsCursor(columns, rows)
+
+
+class CsvSource(FileSource):
+    """Выгрузки CSV с заголовком. Пустое значение читается как NULL
+    у uuid, времени и чисел и как пустая строка у текстовых полей,
+    многие из которых NOT NULL"""
+    extension = 'csv'
+
+    def batches(self, table: str, columns: list, skip: int):
+        types = {field.name: field.type
+                 for field in fields(table_is_dataclass[table])}
+        text = [types[name] is str for name in columns]
+        with open(self.path(table), newline='', encoding='utf-8') as source:
+            reader = csv.reader(source)
+            header = next(reader)
+            pick = itemgetter(*(header.index(name) for name in columns))
+            rowid = 0
+            while lines := list(islice(reader, self.batch_size)):
+                if rowid + len(lines) <= skip:
+                    rowid += len(lines)
+                    continue
+                batch = []
+                for line in lines:
+                    rowid += 1
+                    batch.append((rowid, *(
+                        value if value or is_text else None
+                        for value, is_text in zip(pick(line), text)
+                    )))
+                yield batch
+
+
+class ParquetSource(FileSource):
+    """Выгрузки Parquet. Читаются пачками только нужные колонки,
+    значения извлекаются целыми колонками, а не по строкам"""
+    extension = 'parquet'
+
+    def __init__(self, directory: str, batch_size: int = 1000):
+        super().__init__(directory, batch_size)
+        import pyarrow.parquet
+        self._parquet = pyarrow.parquet
+
+    def batches(self, table: str, columns: list, skip: int):
+        parquet_file = self._parquet.ParquetFile(self.path(table))
+        rowid = 0
+        for record_batch in parquet_file.iter_batches(
+                batch_size=self.batch_size, columns=columns):
+            first = rowid + 1
+            rowid += record_batch.num_rows
+            if rowid <= skip:
+                continue
+            yield list(zip(range(first, rowid + 1),
+                           *(column.to_pylist()
+                             for column in record_batch.columns)))
+
+
+FILE_SOURCES = {
+    'csv': CsvSource,
+    'parquet': ParquetSource,
+}
+
+
+def as_source(connection):
+    """Соединение SQLite оборачивается в источник, источник возвращается
+    как есть"""
+    if isinstance(connection, sqlite3.Connection):
+        return SqliteSource(connection)
+    return connection
@@ -0,0 +1,172 @@
+# Полная перезагрузка без простоя: данные пишутся в UNLOGGED-таблицы
+# схемы content_staging со структурой таблиц content, затем таблицы
+# переводятся в LOGGED, получают индексы, ограничения, владельцев
+# и права доступа content, и схемы подменяются переименованием в одной
+# транзакции
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2.extensions import connection as _connection
+
+from fast_load import DEFERRABLE_QUERY, SCHEMA, analyze_table, create_sql
+from load_data import conn_context_pg
+from settings import table_is_dataclass
+
+STAGING_SCHEMA = 'content_staging'
+RETIRED_SCHEMA = 'content_retired'
+
+# Пользовательские триггеры, например заполнение search_vector.
+# LIKE ... INCLUDING ALL их не копирует
+TRIGGER_QUERY = """
+    SELECT pg_get_triggerdef(t.oid)
+        FROM pg_trigger t
+        JOIN pg_class c ON c.oid = t.tgrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %(schema)s AND c.relname = ANY(%(tables)s)
+            AND NOT t.tgisinternal
+"""
+
+# Владельцы и права схемы content и её таблиц. Права владельца
+# в relacl подразумеваются и отдельно не выдаются
+PRIVILEGE_QUERY = """
+    WITH objects AS (
+        SELECT 'SCHEMA' AS kind, NULL::name AS name,
+               n.nspowner AS owner, n.nspacl AS acl
+            FROM pg_namespace n
+            WHERE n.nspname = %(schema)s
+        UNION ALL
+        SELECT 'TABLE', c.relname, c.relowner, c.relacl
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %(schema)s AND c.relname = ANY(%(tables)s)
+    )
+    SELECT o.kind, o.name, quote_ident(pg_get_userbyid(o.owner)),
+           pg_has_role(o.owner, 'MEMBER'), a.privilege_type,
+           CASE a.grantee WHEN 0 THEN 'PUBLIC'
+               ELSE quote_ident(pg_get_userbyid(a.grantee)) END,
+           a.is_grantable
+        FROM objects o
+        LEFT JOIN LATERAL aclexplode(o.acl) a ON a.grantee <> o.owner
+"""
+
+
+def staging_privileges(pg_conn: _connection) -> list:
+    """GRANT и смена владельца для content_staging по образцу content.
+    Отказывает, если владельцем в content должна стать роль, в которую
+    загрузчик не входит: после подмены таблицы остались бы у него"""
+    cursor = pg_conn.cursor()
+    cursor.execute(PRIVILEGE_QUERY, {'schema': SCHEMA,
+                                     'tables': list(table_is_dataclass)})
+    grants, owners = [], {}
+    for (kind, table, owner, is_member, privilege, grantee,
+         grantable) in cursor.fetchall():
+        if not is_member:
+            raise RuntimeError(
+                f'{SCHEMA}.{table or ""} is owned by {owner}, '
+                'the loader role cannot hand staging tables over to it'
+            )
+        target = (STAGING_SCHEMA if kind == 'SCHEMA'
+                  else f'{STAGING_SCHEMA}.{table}')
+        owners[(kind, target)] = owner
+        if privilege:
+            grants.append(
+                f'GRANT {privilege} ON {kind} {target} TO {grantee}'
+                + (' WITH GRANT OPTION;' if grantable else ';')
+            )
+    # Права выдаются, пока владелец content_staging — загрузчик, смена
+    # владельца затем переписывает его как grantor
+    return grants + [f'ALTER {kind} {target} OWNER TO {owner};'
+                     for (kind, target), owner in owners.items()]
+
+
+def prepare_staging(pg_conn: _connection):
+    """Пересоздаёт content_staging: UNLOGGED-копии таблиц content
+    только с первичными ключами, на которых держится ON CONFLICT (id),
+    и с триггерами, чтобы они срабатывали уже при загрузке"""
+    cursor = pg_conn.cursor()
+    cursor.execute('SET LOCAL search_path TO pg_catalog;')
+    # Проверка владельцев до загрузки, а не после неё
+    staging_privileges(pg_conn)
+    cursor.execute(TRIGGER_QUERY, {'schema': SCHEMA,
+                                   'tables': list(table_is_dataclass)})
+    triggers = [definition.replace(f' {SCHEMA}.', f' {STAGING_SCHEMA}.')
+                for definition, in cursor.fetchall()]
+    cursor.execute(f'DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE;')
+    cursor.execute(f'CREATE SCHEMA {STAGING_SCHEMA};')
+    for table in table_is_dataclass:
+        cursor.execute(f"""
+            CREATE UNLOGGED TABLE {STAGING_SCHEMA}.{table} (
+                LIKE {SCHEMA}.{table}
+                INCLUDING ALL EXCLUDING INDEXES
+            );
+            ALTER TABLE {STAGING_SCHEMA}.{table} ADD PRIMARY KEY (id);
+        """)
+    for definition in triggers:
+        cursor.execute(definition + ';')
+    pg_conn.commit()
+
+
+def staging_definitions(pg_conn: _connection) -> list:
+    """Индексы и ограничения content, переписанные на content_staging.
+    С пустым search_path Postgres полностью квалифицирует имена таблиц"""
+    cursor = pg_conn.cursor()
+    cursor.execute('SET LOCAL search_path TO pg_catalog;')
+    cursor.execute(DEFERRABLE_QUERY, {'schema': SCHEMA,
+                                      'tables': list(table_is_dataclass)})
+    definitions = [
+        (kind, table, name,
+         definition.replace(f' {SCHEMA}.', f' {STAGING_SCHEMA}.'))
+        for kind, table, name, definition in cursor.fetchall()
+    ]
+    pg_conn.rollback()
+    return definitions
+
+
+def _execute(dsl: dict, sql: str):
+    with conn_context_pg(dsl) as pg_conn:
+        pg_conn.cursor().execute(sql)
+        pg_conn.commit()
+    logging.info('%s', ' '.join(sql.split())[:120])
+
+
+def _run_parallel(executor: ThreadPoolExecutor, dsl: dict, statements):
+    for future in [executor.submit(_execute, dsl, sql)
+                   for sql in statements]:
+        future.result()
+
+
+def swap_staging(dsl: dict, jobs: int):
+    """Переводит content_staging в LOGGED, строит индексы и ограничения,
+    анализирует таблицы и одной транзакцией передаёт им владельцев
+    и права content и подменяет ими схему content"""
+    with conn_context_pg(dsl) as pg_conn:
+        definitions = staging_definitions(pg_conn)
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        _run_parallel(executor, dsl, (
+            f'ALTER TABLE {STAGING_SCHEMA}.{table} SET LOGGED;'
+            for table in table_is_dataclass
+        ))
+        # Внешние ключи создаются последними, когда у ссылаемых
+        # таблиц уже есть все индексы
+        for kinds in (('constraint_u', 'index'), ('constraint_f',)):
+            _run_parallel(executor, dsl, (
+                create_sql(kind, table, name, definition, STAGING_SCHEMA)
+                for kind, table, name, definition in definitions
+                if kind in kinds
+            ))
+        for future in [executor.submit(analyze_table, dsl, table,
+                                       STAGING_SCHEMA)
+                       for table in table_is_dataclass]:
+            future.result()
+    with conn_context_pg(dsl) as pg_conn:
+        cursor = pg_conn.cursor()
+        for sql in staging_privileges(pg_conn):
+            cursor.execute(sql)
+        cursor.execute(f"""
+            ALTER SCHEMA {SCHEMA} RENAME TO {RETIRED_SCHEMA};
+            ALTER SCHEMA {STAGING_SCHEMA} RENAME TO {SCHEMA};
+        """)
+        pg_conn.commit()
+        logging.info('%s swapped with %s', STAGING_SCHEMA, SCHEMA)
+        cursor.execute(f'DROP SCHEMA {RETIRED_SCHEMA} CASCADE;')
+        pg_conn.commit()
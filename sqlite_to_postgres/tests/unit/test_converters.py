@@ -0,0 +1,84 @@
+import struct
+import uuid
+from dataclasses import fields
+
+from converters import compile_binary_converter, compile_validator
+from models import Filmwork, Person
+
+PERSON_ID = uuid.UUID('3fa85f64-5717-4562-b3fc-2c963f66afa6')
+
+
+def description(*names) -> tuple:
+    return tuple((name, None, None, None, None, None, None)
+                 for name in names)
+
+
+def read_fields(data: bytes) -> list:
+    """Разбирает кортеж бинарного формата COPY на значения полей"""
+    count, = struct.unpack_from('!h', data)
+    offset = 2
+    values = []
+    for _ in range(count):
+        length, = struct.unpack_from('!i', data, offset)
+        offset += 4
+        if length == -1:
+            values.append(None)
+            continue
+        values.append(data[offset:offset + length])
+        offset += length
+    assert offset == len(data)
+    return values
+
+
+def test_binary_layout():
+    # Колонки выборки идут не в порядке полей датакласса
+    convert = compile_binary_converter(
+        description('rowid', 'modified', 'full_name', 'id', 'created'),
+        Person
+    )
+    data = convert((7, None, 'Пётр', str(PERSON_ID),
+                    '2000-01-01 00:00:01.5+00'))
+    person_id, full_name, created, modified = read_fields(data)
+    assert person_id == PERSON_ID.bytes
+    assert full_name == 'Пётр'.encode('utf-8')
+    assert struct.unpack('!q', created) == (1500000,)
+    assert modified is None
+
+
+def test_binary_timestamp_before_epoch_and_offset():
+    convert = compile_binary_converter(
+        description('id', 'full_name', 'created', 'modified'), Person
+    )
+    _, _, created, modified = read_fields(convert((
+        str(PERSON_ID), '', '1999-12-31 23:59:59+00',
+        '2000-01-01 03:00:00+03'
+    )))
+    assert struct.unpack('!q', created) == (-1000000,)
+    assert struct.unpack('!q', modified) == (0,)
+
+
+def test_binary_float():
+    names = [field.name for field in fields(Filmwork)]
+    convert = compile_binary_converter(description(*names), Filmwork)
+    row = dict.fromkeys(names)
+    row.update(id=str(PERSON_ID), title='', rating='7.5')
+    values = read_fields(convert(tuple(row.values())))
+    assert struct.unpack('!d', values[names.index('rating')]) == (7.5,)
+    assert values[names.index('description')] is None
+
+
+def test_validator_accepts_valid_row():
+    validate = compile_validator(Person)
+    assert validate((str(PERSON_ID), 'Пётр', '2021-06-16 20:14:09+00',
+                     None)) is None
+
+
+def test_validator_reports_first_bad_field():
+    validate = compile_validator(Person)
+    assert validate(('not-a-uuid', 'Пётр', None, None)).startswith('id: ')
+    assert validate((str(PERSON_ID), 1, None, None)).startswith(
+        'full_name: '
+    )
+    assert validate((str(PERSON_ID), '', 'yesterday', None)).startswith(
+        'created: '
+    )
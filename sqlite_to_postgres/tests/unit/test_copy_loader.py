@@ -0,0 +1,24 @@
+from copy_loader import IteratorFile
+
+
+def read_all(source: IteratorFile, size: int) -> list:
+    parts = []
+    while part := source.read(size):
+        parts.append(part)
+    return parts
+
+
+def test_reads_across_chunks():
+    source = IteratorFile(iter([b'ab', b'', b'cde', b'f']), b'')
+    assert read_all(source, 4) == [b'abcd', b'ef']
+
+
+def test_read_everything():
+    source = IteratorFile(iter(['a\n', 'b\n']), '')
+    assert source.read() == 'a\nb\n'
+    assert source.read() == ''
+
+
+def test_large_chunk_in_small_reads():
+    chunk = 'x' * 10000
+    assert ''.join(read_all(IteratorFile(iter([chunk]), ''), 8192)) == chunk
@@ -0,0 +1,22 @@
+from metrics import LoadMetrics
+
+
+def test_prometheus_families_are_contiguous(tmp_path):
+    metrics = LoadMetrics()
+    for table in ('genre', 'person'):
+        metrics.table(table).count('written', 3)
+        metrics.table(table).elapsed = 1.5
+    path = tmp_path / 'loader.prom'
+    metrics.write_prometheus(str(path))
+    families = []
+    for line in path.read_text().splitlines():
+        if line.startswith('# TYPE '):
+            name = line.split()[2]
+            assert name not in families
+            families.append(name)
+            continue
+        assert line.split('{')[0] == families[-1]
+    assert families == ['loader_rows_total', 'loader_stage_seconds_total',
+                        'loader_table_seconds', 'loader_rows_per_second']
+    assert 'loader_rows_total{table="person",result="written"} 3' \
+        in path.read_text()
@@ -0,0 +1,145 @@
+import json
+from datetime import datetime, timezone
+
+import psycopg2
+import pytest
+
+import quarantine
+from quarantine import (DeadLetterFile, DeadLetterTable, bisect_insert,
+                        reject_invalid, write_batch)
+
+COLUMNS = ['id', 'name']
+SQL = 'INSERT INTO content.genre (id, name) VALUES %s;'
+
+
+class FakeConnection:
+    """Транзакция с точками сохранения. Строки и записи карантина
+    видны в committed только после commit"""
+
+    def __init__(self, bad=()):
+        self.bad = set(bad)
+        self.pending = []
+        self.committed = []
+        self.savepoints = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        assert not self.savepoints
+        self.committed.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+        self.savepoints = []
+
+
+class FakeCursor:
+
+    def __init__(self, connection: FakeConnection):
+        self.connection = connection
+        self.rowcount = -1
+
+    def execute(self, sql: str, params: tuple = None):
+        # Как в psycopg2: у команд без строк rowcount равен -1
+        self.rowcount = -1
+        command = ' '.join(sql.split())
+        savepoints = self.connection.savepoints
+        if command.startswith('SAVEPOINT'):
+            savepoints.append(len(self.connection.pending))
+        elif command.startswith('ROLLBACK TO SAVEPOINT'):
+            del self.connection.pending[savepoints.pop():]
+        elif command.startswith('RELEASE SAVEPOINT'):
+            savepoints.pop()
+        elif quarantine.DEAD_LETTER_TABLE in command:
+            table, row, error = params
+            self.connection.pending.append(
+                ('dead_letter', table, json.loads(row)['id'], error)
+            )
+
+
+def fake_execute_values(cursor: FakeCursor, sql: str, rows: list,
+                        page_size: int):
+    for row in rows:
+        if row[0] in cursor.connection.bad:
+            raise psycopg2.IntegrityError(f'duplicate key {row[0]}')
+    cursor.connection.pending.extend(('row', row[0]) for row in rows)
+    cursor.rowcount = len(rows)
+
+
+@pytest.fixture(autouse=True)
+def execute_values(monkeypatch):
+    monkeypatch.setattr(quarantine, 'execute_values', fake_execute_values)
+
+
+def genre_rows(count: int) -> list:
+    return [(f'id{number}', f'name{number}') for number in range(count)]
+
+
+def committed(connection: FakeConnection, kind: str) -> list:
+    return sorted(entry[1] if kind == 'row' else entry[2]
+                  for entry in connection.committed if entry[0] == kind)
+
+
+def test_write_batch_without_errors():
+    connection = FakeConnection()
+    assert write_batch(connection, SQL, genre_rows(4), 'genre', COLUMNS,
+                       DeadLetterTable(connection)) == (4, 0)
+    connection.commit()
+    assert committed(connection, 'row') == ['id0', 'id1', 'id2', 'id3']
+
+
+def test_write_batch_empty():
+    connection = FakeConnection()
+    assert write_batch(connection, SQL, [], 'genre', COLUMNS,
+                       DeadLetterTable(connection)) == (0, 0)
+
+
+def test_bisect_isolates_bad_rows():
+    connection = FakeConnection(bad={'id2', 'id5'})
+    written, failed = bisect_insert(connection, SQL, genre_rows(8), 'genre',
+                                    COLUMNS, DeadLetterTable(connection))
+    connection.commit()
+    assert (written, failed) == (6, 2)
+    assert committed(connection, 'row') == [
+        'id0', 'id1', 'id3', 'id4', 'id6', 'id7'
+    ]
+    assert committed(connection, 'dead_letter') == ['id2', 'id5']
+    errors = [entry[3] for entry in connection.committed
+              if entry[0] == 'dead_letter']
+    assert errors == ['duplicate key id2', 'duplicate key id5']
+
+
+def test_bisect_all_rows_bad():
+    connection = FakeConnection(bad={'id0', 'id1', 'id2'})
+    assert bisect_insert(connection, SQL, genre_rows(3), 'genre', COLUMNS,
+                         DeadLetterTable(connection)) == (0, 3)
+
+
+def test_validation_rejects_survive_failed_batch():
+    connection = FakeConnection(bad={'id3'})
+    dead_letter = DeadLetterTable(connection)
+    rows, rejected = reject_invalid(
+        genre_rows(6), lambda row: 'bad' if row[0] == 'id1' else None,
+        'genre', COLUMNS, dead_letter
+    )
+    written, failed = write_batch(connection, SQL, rows, 'genre', COLUMNS,
+                                  dead_letter)
+    connection.commit()
+    assert (written, failed + rejected) == (4, 2)
+    assert committed(connection, 'dead_letter') == ['id1', 'id3']
+    assert committed(connection, 'row') == ['id0', 'id2', 'id4', 'id5']
+
+
+def test_dead_letter_accepts_datetime(tmp_path):
+    created = datetime(2021, 6, 16, 20, 14, 9, tzinfo=timezone.utc)
+    path = tmp_path / 'dead_letter.jsonl'
+    DeadLetterFile(str(path)).add('genre', {'id': 'id0', 'created': created},
+                                  'error')
+    entry = json.loads(path.read_text())
+    assert entry['row']['created'] == str(created)
+    connection = FakeConnection()
+    DeadLetterTable(connection).add('genre', {'id': 'id0',
+                                              'created': created}, 'error')
+    assert connection.pending == [('dead_letter', 'genre', 'id0', 'error')]
@@ -0,0 +1,52 @@
+import sqlite3
+
+from scheduler import split_rowid_ranges
+
+
+def table_with_rowids(rowids) -> sqlite3.Connection:
+    connection = sqlite3.connect(':memory:')
+    connection.execute('create table person (id text)')
+    connection.executemany('insert into person (rowid, id) values (?, ?)',
+                           ((rowid, str(rowid)) for rowid in rowids))
+    return connection
+
+
+def covered(connection: sqlite3.Connection, ranges: list) -> list:
+    rowids = []
+    for low, high in ranges:
+        rowids.extend(rowid for rowid, in connection.execute(
+            'select rowid from person where rowid > ? and rowid <= ? '
+            'order by rowid', (low, high)))
+    return rowids
+
+
+def test_single_part_is_whole_table():
+    assert split_rowid_ranges(table_with_rowids(range(1, 11)),
+                              'person', 1) == [None]
+
+
+def test_empty_table():
+    assert split_rowid_ranges(table_with_rowids([]), 'person', 4) == [None]
+
+
+def test_ranges_are_contiguous_and_cover_table():
+    connection = table_with_rowids(range(1, 11))
+    ranges = split_rowid_ranges(connection, 'person', 4)
+    assert ranges == [(0, 2), (2, 4), (4, 6), (6, 10)]
+    assert covered(connection, ranges) == list(range(1, 11))
+
+
+def test_fewer_rows_than_parts():
+    connection = table_with_rowids(range(1, 4))
+    ranges = split_rowid_ranges(connection, 'person', 5)
+    assert len(ranges) == 3
+    assert covered(connection, ranges) == [1, 2, 3]
+
+
+def test_sparse_rowids():
+    rowids = [5, 6, 100, 101, 1000]
+    connection = table_with_rowids(rowids)
+    ranges = split_rowid_ranges(connection, 'person', 3)
+    assert len(ranges) == 3
+    assert ranges[0][0] == 4 and ranges[-1][1] == 1000
+    assert covered(connection, ranges) == rowids
@@ -0,0 +1,85 @@
+import pytest
+
+from sources import CsvSource, FileSource
+
+GENRE_HEADER = 'id,name,description,created,modified\n'
+GENRES = [
+    'a,Drama,,2021-06-16 20:14:09+00,2021-06-16 20:14:09+00\n',
+    'b,Comedy,Funny,,\n',
+    'c,Horror,,2021-06-16 20:14:09+00,2021-06-18 10:00:00+00\n',
+    'd,Action,,2021-06-16 20:14:09+00,2021-06-20 10:00:00+03\n',
+]
+
+
+@pytest.fixture
+def source(tmp_path):
+    (tmp_path / 'genre.csv').write_text(GENRE_HEADER + ''.join(GENRES),
+                                        encoding='utf-8')
+    return CsvSource(str(tmp_path), batch_size=2)
+
+
+def test_file_source_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        FileSource(str(tmp_path))
+
+
+def test_csv_empty_values(source):
+    rows = source.read('genre').fetchmany(10)
+    assert [row[0] for row in rows] == [1, 2, 3, 4]
+    # Пустой текст остаётся пустой строкой, пустое время — NULL
+    assert rows[0][3] == ''
+    assert rows[1][4:] == (None, None)
+
+
+def test_csv_columns_in_dataclass_order(tmp_path):
+    (tmp_path / 'genre.csv').write_text(
+        'modified,name,id,created,description\n'
+        '2021-06-16 20:14:09+00,Drama,a,2021-06-16 20:14:09+00,Sad\n',
+        encoding='utf-8'
+    )
+    cursor = CsvSource(str(tmp_path)).read('genre')
+    assert [column[0] for column in cursor.description] == [
+        'rowid', 'id', 'name', 'description', 'created', 'modified']
+    assert cursor.fetchmany(10)[0][:4] == (1, 'a', 'Drama', 'Sad')
+
+
+def test_csv_rowid_range_and_after_rowid(source):
+    rows = source.read('genre', rowid_range=(1, 4)).fetchmany(10)
+    assert [row[0] for row in rows] == [2, 3, 4]
+    rows = source.read('genre', rowid_range=(0, 3),
+                       after_rowid=2).fetchmany(10)
+    assert [row[:2] for row in rows] == [(3, 'c')]
+    rows = source.read('genre', after_rowid=4).fetchmany(10)
+    assert rows == []
+
+
+def test_csv_since(source):
+    rows = source.read('genre', since='2021-06-17 00:00:00+00').fetchmany(10)
+    # Строка без modified и строка старше отметки отбрасываются,
+    # сравнение идёт с учётом часового пояса
+    assert [row[1] for row in rows] == ['c', 'd']
+    rows = source.read('genre', since='2021-06-20 08:00:00+00').fetchmany(10)
+    assert rows == []
+
+
+def test_missing_dump(tmp_path):
+    with pytest.raises(FileNotFoundError, match='genre'):
+        CsvSource(str(tmp_path)).read('genre')
+
+
+def test_parquet_skip_and_since(tmp_path):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+
+    from sources import ParquetSource
+    modified = ['2021-06-16 20:14:09+00', None, '2021-06-18 10:00:00+00']
+    pyarrow.parquet.write_table(pyarrow.table({
+        'id': ['a', 'b', 'c'], 'name': ['Drama', 'Comedy', 'Horror'],
+        'description': ['', 'Funny', ''], 'created': modified,
+        'modified': modified,
+    }), tmp_path / 'genre.parquet')
+    source = ParquetSource(str(tmp_path), batch_size=2)
+    rows = source.read('genre', after_rowid=1).fetchmany(10)
+    assert [row[:2] for row in rows] == [(2, 'b'), (3, 'c')]
+    rows = source.read('genre', since='2021-06-17 00:00:00+00').fetchmany(10)
+    assert [row[:2] for row in rows] == [(3, 'c')]
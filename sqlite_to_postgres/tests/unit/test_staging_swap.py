@@ -0,0 +1,44 @@
+import pytest
+
+from staging_swap import STAGING_SCHEMA, staging_privileges
+
+
+class FakeConnection:
+    """Отдаёт заранее заданные строки PRIVILEGE_QUERY"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_privileges_granted_before_owner_change():
+    statements = staging_privileges(FakeConnection([
+        ('SCHEMA', None, 'app', True, 'USAGE', 'reader', False),
+        ('TABLE', 'genre', 'app', True, 'SELECT', 'reader', False),
+        ('TABLE', 'genre', 'app', True, 'SELECT', 'PUBLIC', True),
+        ('TABLE', 'person', 'app', True, None, None, None),
+    ]))
+    assert statements == [
+        f'GRANT USAGE ON SCHEMA {STAGING_SCHEMA} TO reader;',
+        f'GRANT SELECT ON TABLE {STAGING_SCHEMA}.genre TO reader;',
+        f'GRANT SELECT ON TABLE {STAGING_SCHEMA}.genre TO PUBLIC'
+        ' WITH GRANT OPTION;',
+        f'ALTER SCHEMA {STAGING_SCHEMA} OWNER TO app;',
+        f'ALTER TABLE {STAGING_SCHEMA}.genre OWNER TO app;',
+        f'ALTER TABLE {STAGING_SCHEMA}.person OWNER TO app;',
+    ]
+
+
+def test_foreign_owner_refused():
+    with pytest.raises(RuntimeError, match='content.genre'):
+        staging_privileges(FakeConnection([
+            ('TABLE', 'genre', 'app', False, None, None, None),
+        ]))
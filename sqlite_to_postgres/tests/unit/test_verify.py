@@ -0,0 +1,58 @@
+import sqlite3
+
+from verify import iter_sqlite_rows, merge_diff
+
+
+def diff(source: list, target: list) -> list:
+    return list(merge_diff(iter(source), iter(target)))
+
+
+def test_both_empty():
+    assert diff([], []) == []
+
+
+def test_target_empty():
+    assert diff([('a', '1'), ('b', '2')], []) == [('missing', 'a'),
+                                                  ('missing', 'b')]
+
+
+def test_source_empty():
+    assert diff([], [('a', '1'), ('b', '2')]) == [('extra', 'a'),
+                                                  ('extra', 'b')]
+
+
+def test_equal_sides():
+    rows = [('a', '1'), ('b', '2'), ('c', '3')]
+    assert diff(rows, list(rows)) == []
+
+
+def test_changed_row():
+    assert diff([('a', '1'), ('b', '2')],
+                [('a', '1'), ('b', 'x')]) == [('changed', 'b')]
+
+
+def test_interleaved_ids():
+    source = [('a', '1'), ('c', '3'), ('d', '4'), ('f', '6')]
+    target = [('b', '2'), ('c', '3'), ('d', 'x'), ('e', '5')]
+    assert diff(source, target) == [('missing', 'a'), ('extra', 'b'),
+                                    ('changed', 'd'), ('extra', 'e'),
+                                    ('missing', 'f')]
+
+
+def test_tail_after_other_side_ends():
+    assert diff([('a', '1')], [('a', '1'), ('b', '2'), ('c', '3')]) == [
+        ('extra', 'b'), ('extra', 'c')
+    ]
+
+
+def test_sqlite_rows_sorted_case_insensitively():
+    connection = sqlite3.connect(':memory:')
+    connection.execute('create table person (id text primary key, '
+                       'full_name text, created_at text, updated_at text)')
+    ids = ['B0000000-0000-0000-0000-000000000000',
+           'a0000000-0000-0000-0000-000000000000',
+           'c0000000-0000-0000-0000-000000000000']
+    connection.executemany('insert into person values (?, ?, null, null)',
+                           ((row_id, 'name') for row_id in ids))
+    assert [row_id for row_id, _ in iter_sqlite_rows(connection, 'person')] \
+        == sorted(row_id.lower() for row_id in ids)
@@ -0,0 +1,112 @@
+# Потоковая сверка SQLite и Postgres слиянием отсортированных по id выборок.
+# Postgres читается именованным (серверным) курсором, SQLite — курсором
+# с сортировкой, поэтому память не зависит от размера таблиц
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+
+from psycopg2.extensions import connection as _connection
+
+from consistency import compile_sqlite_row_text, pg_row_text
+from load_data import conn_context_pg, conn_context_sqlite
+from query_for_sqlite import build_query
+from settings import batch_size, dsl, table_is_dataclass
+
+
+def iter_sqlite_rows(connection: sqlite3.Connection, table: str):
+    """Пары (id, нормализованная строка) из SQLite в порядке id.
+    id может быть в любом регистре, а Postgres сортирует uuid как
+    строки в нижнем регистре, поэтому сортировка тоже по lower(id)"""
+    cursor = connection.cursor()
+    cursor.row_factory = None
+    cursor.execute(build_query(table, order_by='lower(id)'))
+    row_text = compile_sqlite_row_text(cursor.description,
+                                       table_is_dataclass[table])
+    id_position = [column[0] for column in cursor.description].index('id')
+    for row in cursor:
+        yield row[id_position].lower(), row_text(row)
+
+
+def iter_pg_rows(pg_conn: _connection, table: str, itersize: int,
+                 schema: str = 'content'):
+    """Пары (id, нормализованная строка) из Postgres в порядке id"""
+    pg_conn.cursor().execute("SET TIME ZONE 'UTC';")
+    with pg_conn.cursor(name=f'verify_{table}') as cursor:
+        cursor.itersize = itersize
+        cursor.execute(f"""
+            SELECT id::text, {pg_row_text(table_is_dataclass[table])}
+                FROM {schema}.{table}
+                ORDER BY id;
+        """)
+        for row_id, text in cursor:
+            yield row_id, text
+
+
+def merge_diff(source, target):
+    """Сливает две отсортированные по id последовательности и отдаёт
+    расхождения: missing — нет в Postgres, extra — нет в SQLite,
+    changed — строки с одинаковым id различаются"""
+    source_row = next(source, None)
+    target_row = next(target, None)
+    while source_row is not None or target_row is not None:
+        if target_row is None or (source_row is not None
+                                  and source_row[0] < target_row[0]):
+            yield 'missing', source_row[0]
+            source_row = next(source, None)
+        elif source_row is None or target_row[0] < source_row[0]:
+            yield 'extra', target_row[0]
+            target_row = next(target, None)
+        else:
+            if source_row[1] != target_row[1]:
+                yield 'changed', source_row[0]
+            source_row = next(source, None)
+            target_row = next(target, None)
+
+
+def verify_table(connection: sqlite3.Connection, pg_conn: _connection,
+                 table: str, report, itersize: int) -> dict:
+    """Пишет расхождения таблицы в report построчно в JSON,
+    возвращает их количество по видам"""
+    counts = {'missing': 0, 'extra': 0, 'changed': 0}
+    for kind, row_id in merge_diff(iter_sqlite_rows(connection, table),
+                                   iter_pg_rows(pg_conn, table, itersize)):
+        counts[kind] += 1
+        report.write(json.dumps({'table': table, 'kind': kind,
+                                 'id': row_id}) + '\n')
+    return counts
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Сверка данных SQLite и Postgres'
+    )
+    parser.add_argument('--table', action='append',
+                        choices=list(table_is_dataclass),
+                        help='проверить только указанные таблицы')
+    parser.add_argument('--itersize', type=int, default=batch_size,
+                        help='строк за одно обращение к серверному курсору')
+    parser.add_argument('--output', help='файл отчёта, по умолчанию stdout')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    logging.basicConfig(format='%(process)d-%(levelname)s-%(message)s',
+                        level=logging.INFO)
+    report = open(args.output, 'w') if args.output else sys.stdout
+    has_diff = False
+    try:
+        with conn_context_sqlite(os.environ.get('PATH_TO_SQLITE'))\
+                as sqlite_conn, conn_context_pg(dsl) as pg_conn:
+            for table in args.table or table_is_dataclass:
+                counts = verify_table(sqlite_conn, pg_conn, table, report,
+                                      args.itersize)
+                has_diff = has_diff or any(counts.values())
+                logging.info('%s: %s', table, counts)
+    finally:
+        if report is not sys.stdout:
+            report.close()
+    sys.exit(1 if has_diff else 0)